@@ -39,13 +39,43 @@ def parse_gamma_from_line(line):
     if not cand: return None
     return min(cand)
 
+# almacen binario <fichero>.bin de ../zero_store.py, si esta disponible; se carga
+# por ruta para no tocar sys.path
+def _import_zero_store():
+    import importlib.util
+    p = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "zero_store.py")
+    if not os.path.exists(p): return None
+    spec = importlib.util.spec_from_file_location("zero_store", p)
+    mod = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(mod)
+    except ImportError:
+        return None
+    return mod
+
+zero_store = _import_zero_store()
+
+# ficheros binarios de ../zero_store.py y ../zero_archive.py: no son texto de ceros
+BINARY_MAGICS = (b"ZSTORE01", b"ZARCH001")
+
+def is_binary_zeros(path):
+    with open(path, "rb") as f:
+        return f.read(8) in BINARY_MAGICS
+
 def load_gammas(folder, Tcap=None):
     seen=set()
     for name in os.listdir(folder):
         low = name.lower()
-        if "hash" in low: continue
+        if "hash" in low or low.endswith((".bin", ".zarc", ".tmp")): continue
         path = os.path.join(folder, name)
-        if not os.path.isfile(path): continue
+        if not os.path.isfile(path) or is_binary_zeros(path): continue
+        zs = zero_store.open_sidecar(path) if zero_store is not None else None
+        if zs is not None:
+            # texto 'plain': parse_gamma_from_line daria exactamente estos floats;
+            # g ordenado: el recorte por Tcap es un prefijo (count_le por cubetas)
+            g = zs.g if Tcap is None else zs.g[:zs.count_le(Tcap)]
+            seen.update(round(v,12) for v in g.tolist())
+            continue
         with open(path,"r",encoding="utf-8",errors="ignore") as f:
             for line in f:
                 g = parse_gamma_from_line(line)
@@ -0,0 +1,386 @@
+# engine_plan.py
+# Planificador por modelo de coste para los scripts explicit_*: con los x, el
+# corte k_x (ceros <= T_x), los nucleos y la RAM disponible estima tiempo y pico de
+# memoria de cada engine de la suma explicita y de cada modo de psi, y elige el
+# mas barato que cabe. Las constantes (segundos por operacion elemental) salen de
+# un fichero de calibracion; sin fichero se usan las de DEFAULT_CAL.
+#
+#   python engine_plan.py --calibrate                 # micro-benchmark -> engine_calibration.json
+#   python explicit_compare_policy_param.py ... --engine auto --plan   # solo imprime el plan
+#
+# Modelo (pares = sum_x k_x; teselas = sum por bloque de filas de filas*kmax):
+#   scalar      pares * scalar_pair
+#   numpy       teselas * numpy_pair                    (/xworkers + arranque del pool)
+#   recurrence  pares * recurrence_pair                 (solo x de make_x_points)
+#   dd          teselas * dd_pair                       (unico valido si x >= DD_XMIN)
+#   nufft       por grupo de corte: (k*(2msp+1) + nx*2w + Mr log2 Mr) * nufft_unit
+#   sieve       xmax * sieve_int,   ~9 B/entero
+#   segmented   xmax * segmented_int / workers,  workers*segmento*17 B
+#   sublinear   sum x^{3/4}/log x * sublinear_unit (x > 1e7; los bajos por criba)
+
+import argparse, bisect, json, math, os, time
+
+CAL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "engine_calibration.json")
+DEFAULT_CAL = {
+    "scalar_pair": 3e-7,
+    "numpy_pair": 4e-8,
+    "recurrence_pair": 5e-8,
+    "dd_pair": 1e-7,
+    "nufft_unit": 5e-8,
+    "pool_start": 0.05,
+    "sieve_int": 3e-8,
+    "segmented_int": 3e-8,
+    "sublinear_unit": 3e-7,
+    "table_x": 2e-5,
+}
+RAM_FRACTION = 0.8      # de MemAvailable
+DD_XMIN = 1e12          # por encima las fases float64 pierden digitos (ver explicit_engine)
+SUBLINEAR_DENSE = 10**7
+
+def load_calibration(path=None):
+    cal = dict(DEFAULT_CAL)
+    path = path or CAL_PATH
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            cal.update({k: float(v) for k, v in json.load(f).items() if k in DEFAULT_CAL})
+    return cal
+
+def available_ram():
+    # bytes de MemAvailable (Linux); si no, paginas libres de sysconf
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for s in f:
+                if s.startswith("MemAvailable:"):
+                    return int(s.split()[1])*1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES")*os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return 1 << 32
+
+def ram_budget(args=None):
+    # RAM utilizable: MemAvailable*RAM_FRACTION, o --mem_budget si es menor
+    b = int(RAM_FRACTION*available_ram())
+    if args is not None and getattr(args, "mem_budget", None):
+        b = min(b, parse_bytes(args.mem_budget))
+    return b
+
+def parse_bytes(s):
+    # "512M", "2G", "1.5e9" -> bytes (sufijos binarios K/M/G/T)
+    s = str(s).strip().upper().rstrip("B").rstrip("I")
+    mult = 1
+    if s and s[-1] in "KMGT":
+        mult = 1 << (10*("KMGT".index(s[-1]) + 1)); s = s[:-1]
+    return int(float(s)*mult)
+
+def _tiles(ks, xblock):
+    # pares que recorren las teselas numpy: cada bloque de filas llega hasta su kmax
+    return sum((min(i+xblock, len(ks)) - i)*max(ks[i:i+xblock]) for i in range(0, len(ks), xblock))
+
+def _nufft_cost(xs, gammas, ks, tol, xblock, cal):
+    import explicit_engine as ee
+    msp, w = ee._nufft_params(tol)
+    groups = {}
+    for x, k in zip(xs, ks):
+        groups.setdefault(k, []).append(x)
+    t = 0.0; mem = 0; small = []
+    for k, gx in groups.items():
+        if k == 0: continue
+        if len(gx) < ee.NUFFT_MIN_X:
+            small.extend([k]*len(gx)); continue
+        G = max(0.5*(gammas[k-1] - gammas[0]), 1.0)
+        hL = math.pi/(ee.NUFFT_SIGMA*G)
+        half = int(math.ceil(0.5*math.log(max(gx)/min(gx))/hL)) + w + 1
+        Mr = 4*half
+        t += (k*(2*msp + 1) + len(gx)*2*w + Mr*math.log2(max(Mr, 2)))*cal["nufft_unit"]
+        mem = max(mem, 48*k*(2*msp + 1) + 48*Mr + 40*len(gx)*2*w)
+    if small:
+        small.sort()
+        t += _tiles(small, xblock)*cal["numpy_pair"]
+    return t, mem
+
+def _grid_ok(xs, args):
+    import explicit_engine as ee
+    if not all(hasattr(args, a) for a in ("xmax", "points", "xmin")): return False
+    try:
+        ee.grid_indices(xs, args.xmax, args.points, args.xmin)
+        return True
+    except SystemExit:
+        return False
+
+def plan_explicit(xs, gammas, Ts, args, cal=None):
+    # [{name, seconds, bytes, ok, note}] para cada engine
+    cal = cal or load_calibration(getattr(args, "calibration", None))
+    ks = [bisect.bisect_right(gammas, T) for T in Ts]
+    pairs = sum(ks); nx = len(xs); nz = max(ks, default=0)
+    xb, zb = args.xblock, args.zblock
+    tiles = _tiles(ks, xb)
+    W = max(1, getattr(args, "xworkers", 1))
+    pool = cal["pool_start"]*W if W > 1 else 0.0
+    big = bool(xs) and max(xs) >= DD_XMIN
+    try:
+        import numpy  # noqa: F401
+        have_np = True
+    except ImportError:
+        have_np = False
+    cert = getattr(args, "certified", False)
+    zmem = 24*nz + 16*nx   # (g, a, b) y L, sqrt x
+    out = [{"name": "scalar", "seconds": pairs*cal["scalar_pair"]/W + pool,
+            "bytes": 64*len(gammas)*W + 64*nx, "ok": True, "note": ""}]
+    out.append({"name": "numpy", "seconds": tiles*cal["numpy_pair"]/W + pool,
+                "bytes": (6*8*xb*zb + zmem)*W, "ok": have_np, "note": "" if have_np else "sin numpy"})
+    rec_ok = have_np and _grid_ok(xs, args)
+    out.append({"name": "recurrence", "seconds": pairs*cal["recurrence_pair"],
+                "bytes": 12*8*zb + zmem, "ok": rec_ok,
+                "note": "" if rec_ok else "x fuera de la rejilla de make_x_points"})
+    if have_np:
+        t, m = _nufft_cost(xs, gammas, ks, getattr(args, "nufft_tol", 1e-10), xb, cal)
+    else:
+        t, m = float("inf"), 0
+    out.append({"name": "nufft", "seconds": t, "bytes": m + zmem, "ok": have_np,
+                "note": f"tol {getattr(args, 'nufft_tol', 1e-10):.0e}"})
+    out.append({"name": "dd", "seconds": tiles*cal["dd_pair"], "bytes": 14*8*xb*zb + 2*zmem,
+                "ok": have_np, "note": "fase doble-doble"})
+    for c in out:
+        if cert and c["name"] not in ("scalar", "numpy"):
+            c["ok"] = False; c["note"] = "--certified: solo scalar/numpy"
+        elif big and c["name"] != "dd" and c["ok"]:
+            c["ok"] = False; c["note"] = f"x >= {DD_XMIN:.0e}: fases float64 sin digitos suficientes"
+        if W > 1 and c["name"] not in ("scalar", "numpy"):
+            c["note"] = (c["note"] + "; " if c["note"] else "") + "un solo proceso"
+    return out
+
+def plan_psi(xs, xmax, args, cal=None):
+    # [{name, seconds, bytes, ok, note}] para cada modo de psi
+    cal = cal or load_calibration(getattr(args, "calibration", None))
+    xmax = int(xmax)
+    pts = sorted(set(int(x) for x in xs)) or [xmax]
+    try:
+        import numpy  # noqa: F401
+        have_np = True
+    except ImportError:
+        have_np = False
+    out = []
+    table = None
+    if have_np:
+        import psi_table
+        table = psi_table.open_table(args.psi_table or psi_table.DEFAULT_DIR, xmax)
+    out.append({"name": "table", "seconds": len(pts)*cal["table_x"], "bytes": 0, "ok": table is not None,
+                "note": "" if table is not None else "sin tabla que cubra xmax"})
+    lx = math.log(max(xmax, 3))
+    sieve_b = 9*xmax + 16*xmax/lx if have_np else 100*xmax
+    out.append({"name": "sieve", "seconds": xmax*cal["sieve_int"]*(1 if have_np else 20),
+                "bytes": int(sieve_b), "ok": True, "note": ""})
+    W = max(1, getattr(args, "workers", 1))
+    seg = getattr(args, "segment", 1 << 22)
+    out.append({"name": "segmented", "seconds": xmax*cal["segmented_int"]/W + (cal["pool_start"]*W if W > 1 else 0.0),
+                "bytes": int(17*W*min(seg, xmax + 1) + 16*math.sqrt(xmax)), "ok": have_np,
+                "note": f"{W} procesos"})
+    low = [x for x in pts if x <= SUBLINEAR_DENSE]
+    t = (low[-1]*cal["sieve_int"] if low else 0.0) + \
+        sum(x**0.75/math.log(x) for x in pts[len(low):])*cal["sublinear_unit"]
+    m = max(9*low[-1] if low else 0, int(48*math.sqrt(pts[-1])))
+    out.append({"name": "sublinear", "seconds": t, "bytes": m, "ok": have_np, "note": ""})
+    return out
+
+def choose(cands, budget):
+    # el mas rapido de los validos que cabe en budget; empate -> orden de la lista
+    fit = [c for c in cands if c["ok"] and c["bytes"] <= budget]
+    if not fit:
+        fit = [c for c in cands if c["ok"]]
+        if not fit: raise SystemExit("ningun engine valido para esta configuracion")
+        return min(fit, key=lambda c: c["bytes"])
+    return min(fit, key=lambda c: c["seconds"])
+
+def _fmt_bytes(b):
+    for u in ("B", "KiB", "MiB", "GiB"):
+        if b < 1024 or u == "GiB": return f"{b:.0f} {u}" if u == "B" else f"{b:.1f} {u}"
+        b /= 1024.0
+
+def print_plan(title, cands, pick, budget):
+    print(f"[plan] {title} (RAM util {_fmt_bytes(budget)}):")
+    for c in cands:
+        mark = "*" if c is pick else " "
+        st = "" if c["ok"] else "  [no valido]"
+        extra = f"  ({c['note']})" if c["note"] else ""
+        print(f"  {mark} {c['name']:<11} {c['seconds']:>10.3g} s  {_fmt_bytes(c['bytes']):>10}{st}{extra}")
+
+def pick_engine(xs, gammas, Ts, args):
+    # --engine auto: fija args.engine al mas barato; --plan: imprime y termina
+    cands = plan_explicit(xs, gammas, Ts, args)
+    budget = ram_budget(args)
+    if args.engine == "auto":
+        pick = choose(cands, budget)
+    else:
+        pick = next(c for c in cands if c["name"] == args.engine)
+    if getattr(args, "plan", False):
+        print_plan(f"suma explicita: {len(xs)} x, {sum(bisect.bisect_right(gammas, T) for T in Ts)} pares (x, cero)",
+                   cands, pick, budget)
+        raise SystemExit(0)
+    if args.engine == "auto":
+        print(f"[plan] engine auto -> {pick['name']} (~{pick['seconds']:.3g} s, {_fmt_bytes(pick['bytes'])})")
+        args.engine = pick["name"]
+    return pick
+
+def pick_psi(xs, xmax, args):
+    # --psi auto: psi denso (tabla, criba) si cabe en RAM; si no, el mas barato entre
+    # segmented y sublinear. Los consumidores que indexan psi[n] en todo [0, xmax]
+    # (--smooth, explicit_maxratio) siguen recibiendo psi denso siempre que quepa.
+    cands = plan_psi(xs, xmax, args)
+    budget = ram_budget(args)
+    if args.psi == "auto":
+        dense = [c for c in cands if c["name"] in ("table", "sieve") and c["ok"] and c["bytes"] <= budget]
+        pick = dense[0] if dense else choose([c for c in cands if c["name"] in ("segmented", "sublinear")], budget)
+    else:
+        pick = next(c for c in cands if c["name"] == args.psi)
+        if pick["name"] == "sieve" and pick["bytes"] > budget and getattr(args, "mem_budget", None) and xs:
+            # mas pasadas en vez de fallar: la criba por segmentos da psi en los mismos x
+            print(f"[mem] criba densa ~{_fmt_bytes(pick['bytes'])} > presupuesto: --psi segmented")
+            pick = next(c for c in cands if c["name"] == "segmented")
+    if getattr(args, "plan", False):
+        print_plan(f"psi hasta {int(xmax)}", cands, pick, budget)
+    return pick["name"]
+
+# ---- Presupuesto de memoria (--mem_budget) ----
+# Bytes por elemento de cada estructura que escala con el trabajo:
+MEM_SEGMENT = 41    # por entero de segmento: mascara, Lambda, indices, acumulado de run_scan
+MEM_TILE = {"numpy": 48, "recurrence": 48, "nufft": 48, "dd": 112}   # por celda x*cero (scalar no usa teselas)
+MEM_SCAN_X = 160    # por x de un bloque de run_scan
+MEM_SHARE = 4       # cada estructura se limita a 1/MEM_SHARE del presupuesto
+MIN_ZBLOCK = 128
+MIN_XBLOCK = 8
+
+def apply_mem_budget(args, engine=None):
+    # Ajusta segmento, teselas y bloque de scan a --mem_budget: con menos memoria se
+    # dan mas pasadas, los resultados no cambian. Segmento y scan una vez por ejecucion;
+    # las teselas cuando el engine ya esta resuelto (con 'auto' se espera a pick_engine).
+    B = getattr(args, "mem_budget", None)
+    if not B: return
+    B = parse_bytes(B)
+    part = B//MEM_SHARE
+    if not getattr(args, "_mem_applied", False):
+        args._mem_applied = True
+        if hasattr(args, "segment"):
+            W = max(1, getattr(args, "workers", 1)) if getattr(args, "psi", "") == "segmented" else 1
+            seg = max(1 << 16, part//(MEM_SEGMENT*W))
+            if args.segment > seg:
+                args.segment = 1 << (seg.bit_length() - 1)
+        if hasattr(args, "scan_chunk"):
+            args.scan_chunk = max(args.xblock if hasattr(args, "xblock") else 1,
+                                  min(args.scan_chunk, part//MEM_SCAN_X))
+        print(f"[mem] presupuesto {_fmt_bytes(B)}: segment={getattr(args, 'segment', '-')}")
+        import atexit
+        atexit.register(report_peak_rss, B)
+    engine = engine or getattr(args, "engine", None)
+    if hasattr(args, "xblock") and engine in MEM_TILE and not getattr(args, "_mem_tiles", False):
+        args._mem_tiles = True
+        per = part//max(1, getattr(args, "xworkers", 1))
+        cost = MEM_TILE[engine]
+        if cost*args.xblock*args.zblock > per:
+            args.zblock = max(MIN_ZBLOCK, per//(cost*args.xblock))
+            if cost*args.xblock*args.zblock > per:
+                args.xblock = max(MIN_XBLOCK, per//(cost*args.zblock))
+        print(f"[mem] teselas {engine}: xblock={args.xblock} zblock={args.zblock}")
+
+def peak_rss():
+    # (pico propio, pico de hijos) en bytes, o None si no hay forma de medirlo
+    try:
+        import resource
+    except ImportError:   # Windows: sin resource, psutil si esta instalado
+        try:
+            import psutil
+        except ImportError:
+            return None
+        mi = psutil.Process().memory_info()
+        return getattr(mi, "peak_wset", mi.rss), 0
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*1024,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss*1024)
+
+def report_peak_rss(budget=None):
+    # al salir de toda ejecucion con --mem_budget (sin el flag no se registra: la
+    # salida por defecto de los scripts no cambia)
+    pk = peak_rss()
+    if pk is None:
+        print("[mem] pico RSS no disponible (sin resource ni psutil)", flush=True)
+        return
+    own, kids = pk
+    msg = f"[mem] pico RSS {_fmt_bytes(own)}"
+    if kids: msg += f" (hijos: {_fmt_bytes(kids)})"
+    if budget: msg += f", presupuesto {_fmt_bytes(budget)}"
+    print(msg, flush=True)
+
+# ---- Calibracion: micro-benchmarks de cada kernel ----
+
+def _best(fn, reps=3):
+    t = float("inf")
+    for _ in range(reps):
+        t0 = time.perf_counter(); fn(); t = min(t, time.perf_counter() - t0)
+    return t
+
+def calibrate(path=CAL_PATH, zeros=None):
+    import numpy as np
+    import explicit_engine as ee
+    import psi_sieve as ps
+    import multiprocessing as mpc
+    if zeros:
+        from explicit_compare_policy_param import read_gammas
+        gammas = read_gammas(zeros)[:4096]
+    else:
+        gammas = (14.0 + 2.0*np.arange(4096)).tolist()   # espaciado similar, basta para el coste
+    cal = {}
+    g = gammas[:2000]
+    xs = list(range(10**5, 10**5 + 20))
+
+    def scalar():
+        for x in xs:
+            L = math.log(x); sq = math.sqrt(x); S = 0.0
+            for gg in g:
+                den = 0.25 + gg*gg
+                S += 2.0*sq*((0.5*math.cos(gg*L) + gg*math.sin(gg*L))/den)
+    cal["scalar_pair"] = _best(scalar)/(len(xs)*len(g))
+    xs = [int(round(math.exp(math.log(100) + i*(math.log(1e6) - math.log(100))/511))) for i in range(512)]
+    xs = sorted(set(xs))
+    ks = [len(gammas)]*len(xs)
+    cal["numpy_pair"] = _best(lambda: ee.explicit_sums(xs, gammas, ks))/(len(xs)*len(gammas))
+    grid = ee.grid_indices(xs, 10**6, 512, 100)
+    h = (math.log(1e6) - math.log(100))/511
+    cal["recurrence_pair"] = _best(lambda: ee.explicit_sums_recurrence(xs, gammas, ks, grid, h))/(len(xs)*len(gammas))
+    ghi = np.asarray(gammas); glo = np.zeros_like(ghi)
+    cal["dd_pair"] = _best(lambda: ee.explicit_sums_dd(xs, ghi, glo, ks))/(len(xs)*len(gammas))
+    # unidad NUFFT: tiempo / operaciones del modelo, con un grupo grande
+    xn = list(range(10**5, 10**5 + 4096))
+    kn = [len(gammas)]*len(xn)
+    units, _ = _nufft_cost(xn, gammas, kn, ee.NUFFT_TOL, ee.XBLOCK, dict(DEFAULT_CAL, nufft_unit=1.0, numpy_pair=0.0))
+    cal["nufft_unit"] = _best(lambda: ee.explicit_sums_nufft(xn, gammas, kn))/units
+    n = 4*10**6
+    cal["sieve_int"] = _best(lambda: ps.psi_exact_upto(n), 2)/n
+    cal["segmented_int"] = _best(lambda: ps.psi_at_points([n], n, ps.SEGMENT, 1), 2)/n
+
+    def start_pool():
+        with mpc.Pool(processes=2) as p:
+            p.map(abs, [1, 2])
+    cal["pool_start"] = _best(start_pool, 2)/2
+    xb = 10**10
+    cal["sublinear_unit"] = _best(lambda: ps.psi_sublinear(xb), 1)/(xb**0.75/math.log(xb))
+    cal["table_x"] = DEFAULT_CAL["table_x"]   # lectura mapeada: no compensa medirla
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(cal, f, indent=2)
+    return cal
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--calibrate", action="store_true", help="mide las constantes y escribe el fichero")
+    ap.add_argument("--calibration", default=CAL_PATH, help="fichero JSON de constantes")
+    ap.add_argument("--zeros", default=None, help="ceros reales para el benchmark (opcional)")
+    args = ap.parse_args()
+    if args.calibrate:
+        cal = calibrate(args.calibration, args.zeros)
+        print(args.calibration)
+    else:
+        cal = load_calibration(args.calibration)
+    for k in DEFAULT_CAL:
+        print(f"  {k:<16} {cal[k]:.3e}")
+
+if __name__ == "__main__":
+    main()
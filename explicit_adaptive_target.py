@@ -1,7 +1,12 @@
 # explicit_adaptive_target.py
 import argparse, math
+import psi_sieve as ps
+import zero_store
+import explicit_checkpoint as ck
 
 def read_gammas(path):
+    gs=zero_store.read_sorted(path)   # <path>.bin al dia: sin reparsear el texto
+    if gs is not None: return gs
     gs=[]
     with open(path,"r",encoding="utf-8-sig") as f:
         for s in f:
@@ -10,25 +15,6 @@ def read_gammas(path):
     gs.sort()
     return gs
 
-def psi_exact_upto(xmax):
-    spf=list(range(xmax+1))
-    for i in range(2,int(xmax**0.5)+1):
-        if spf[i]==i:
-            for j in range(i*i, xmax+1, i):
-                if spf[j]==j: spf[j]=i
-    logp=[0.0]*(xmax+1)
-    for i in range(2,xmax+1):
-        if spf[i]==i: logp[i]=math.log(i)
-    lam=[0.0]*(xmax+1)
-    for n in range(2,xmax+1):
-        p=spf[n]; m=n
-        while m%p==0: m//=p
-        if m==1: lam[n]=logp[p]
-    psi=[0.0]*(xmax+1); run=0.0
-    for n in range(1,xmax+1):
-        run+=lam[n]; psi[n]=run
-    return psi
-
 def make_x_points(xmax, k, xmin=2):
     xmin=max(2,int(xmin))
     if k<=1: return [max(xmin,xmax)]
@@ -59,25 +45,99 @@ def psi_explicit_from_prefix(x, gammas, pref, k):
     S = pref[k] if k>=0 else 0.0
     return x - S - tail
 
-def main():
-    ap=argparse.ArgumentParser()
-    ap.add_argument("--xmax", type=int, required=True)
-    ap.add_argument("--points", type=int, default=200)
-    ap.add_argument("--xmin", type=int, default=100)
-    ap.add_argument("--zeros", required=True)
-    ap.add_argument("--target", type=float, default=1e-3, help="umbral para el ratio")
-    ap.add_argument("--out", required=True)
-    args=ap.parse_args()
+# k_stable segun el corte: sin ceros por encima del fichero ninguno es una prueba
+# absoluta; 'patience' ni siquiera cubre el resto del fichero
+STABLE_KIND = {"bound": "cota_fichero", "end": "fichero_completo", "patience": "heuristico"}
 
-    gammas=read_gammas(args.zeros)
-    psi=psi_exact_upto(args.xmax)
-    xs=make_x_points(args.xmax, args.points, args.xmin)
+def stream_k_search(x, pe, g, a, b, tailbound, targets, chunk, patience=0):
+    # Recorre los ceros por bloques de 'chunk' acumulando S_k sin guardar prefijos.
+    # Para cada target registra el primer k con ratio<=target y el k estable
+    # minimo (ratio<=target para todo k'>=k explorado). Un target se da por
+    # cerrado si:
+    #  - 'bound': |rem_K| + 2*sqrt(x)*sum_{j>=K} 1/|rho_j| <= target*denom, con la
+    #    suma solo sobre los ceros del fichero (no dice nada de ceros por encima
+    #    de su ultima altura); es muy holgada y casi nunca corta antes del final;
+    #  - 'patience': lleva 'patience' bloques seguidos sin superar el umbral.
+    #    Heuristico: un bloque posterior podria volver a superarlo.
+    # Devuelve tambien el motivo del corte ('bound', 'patience' o 'end').
+    import numpy as np
+    L=math.log(x); sq=math.sqrt(x)
+    denom=math.sqrt(x)*(math.log(x)**2)
+    base = pe - (x - math.log(2.0*math.pi) - 0.5*math.log(1.0 - x**-2))  # rem con k=0
+    thr=[t*denom for t in targets]
+    first=[None]*len(targets); stable=[None]*len(targets); done=[False]*len(targets)
+    quiet=[0]*len(targets); why=[None]*len(targets)
+    kk=np.zeros(1, dtype=np.int64); rr=np.array([base]); carry=0.0
+    j0=0; n=g.size
+    while True:
+        for i,t in enumerate(thr):
+            if done[i]: continue
+            ok = np.abs(rr) <= t
+            if first[i] is None and ok.any():
+                m=int(np.argmax(ok)); first[i]=(int(kk[m]), float(rr[m]))
+            bad=np.nonzero(~ok)[0]
+            if bad.size:
+                lb=int(bad[-1])
+                stable[i] = (int(kk[lb+1]), float(rr[lb+1])) if lb+1 < rr.size else None
+                quiet[i]=0
+            else:
+                if stable[i] is None:
+                    stable[i]=(int(kk[0]), float(rr[0]))
+                if kk[-1]>0: quiet[i]+=1
+            K=int(kk[-1])
+            if abs(rr[-1]) + 2.0*sq*tailbound[K] <= t:
+                done[i]=True; why[i]="bound"
+            elif K>=n:
+                done[i]=True; why[i]="end"
+            elif patience and quiet[i]>=patience:
+                done[i]=True; why[i]="patience"
+        if all(done): break
+        j1=min(j0+chunk, n)
+        ph=g[j0:j1]*L
+        S=carry + np.cumsum(2.0*sq*(a[j0:j1]*np.cos(ph) + b[j0:j1]*np.sin(ph)))
+        carry=float(S[-1])
+        kk=np.arange(j0+1, j1+1, dtype=np.int64); rr=base + S
+        j0=j1
+    return first, stable, int(kk[-1]), float(rr[-1]), why
 
-    with open(args.out,"w",encoding="utf-8") as f:
-        f.write("x,psi_exact,psi_explicit,remainder psi_exact - explicit,ratio = |remainder|/(sqrt(x)*log(x)^2),T_chosen,k\n")
-        for x in xs:
+def stream_rows(args, gammas, xs):
+    # (cabecera, rows(i0, i1, psi) -> lineas CSV) del modo --stream
+    import numpy as np
+    g=np.asarray(gammas, dtype=np.float64); den=0.25+g*g
+    a=0.5/den; b=g/den
+    # tailbound[K] = sum_{j>=K} 1/|rho_j|  (|0.5cos+g sin|/den <= 1/|rho|)
+    inv=1.0/np.sqrt(den)
+    tailbound=np.concatenate([np.cumsum(inv[::-1])[::-1], [0.0]])
+    Tk=lambda k: gammas[k-1] if k and k>0 else 0.0
+    header="x,psi_exact,psi_explicit,remainder psi_exact - explicit,ratio = |remainder|/(sqrt(x)*log(x)^2),target,k_first,T_first,k_stable,T_stable,k_scanned,stop,k_stable_kind\n"
+
+    def rows(i0, i1, psi):
+        out=[]
+        for x in xs[i0:i1]:
             pe=psi[x]
-            pref=explicit_terms_for_x(x, gammas)
+            first, stable, kscan, rem_last, why = stream_k_search(x, pe, g, a, b, tailbound, args.target,
+                                                                  args.chunk, args.patience)
+            denom=math.sqrt(x)*(math.log(x)**2)
+            for t, fi, st, wy in zip(args.target, first, stable, why):
+                kf = fi[0] if fi else -1
+                # sin k estable: se reporta el remanente con todos los ceros explorados
+                ks, rem = st if st else (-1, rem_last)
+                px = pe - rem
+                ratio = abs(rem)/denom if denom>0 else 0.0
+                out.append(f"{x},{pe:.12f},{px:.12f},{rem:.12f},{ratio:.12e},{t:g},{kf},{Tk(kf):.6f},{ks},{Tk(ks):.6f},{kscan},{wy},{STABLE_KIND[wy]}\n")
+        return out
+    return header, rows
+
+def basic_rows(args, gammas, xs):
+    # (cabecera, rows(i0, i1, psi) -> lineas CSV) del modo por defecto
+    header="x,psi_exact,psi_explicit,remainder psi_exact - explicit,ratio = |remainder|/(sqrt(x)*log(x)^2),T_chosen,k\n"
+    gl=gammas.tolist() if hasattr(gammas,"tolist") else gammas   # vista del .bin -> floats de Python
+
+    def rows(i0, i1, psi):
+        out=[]
+        for x in xs[i0:i1]:
+            pe=psi[x]
+            pref=explicit_terms_for_x(x, gl)
             # b?squeda secuencial/binary sobre k (0..len(gammas)-1)
             lo, hi = -1, len(gammas)-1
             best_k = hi
@@ -87,7 +147,7 @@ def main():
                 rem = pe - px
                 denom = math.sqrt(x)*(math.log(x)**2)
                 ratio = abs(rem)/denom if denom>0 else 0.0
-                if ratio <= args.target:
+                if ratio <= args.target[0]:
                     best_k = mid; hi = mid
                 else:
                     lo = mid+1
@@ -97,7 +157,41 @@ def main():
             denom = math.sqrt(x)*(math.log(x)**2)
             ratio = abs(rem)/denom if denom>0 else 0.0
             T = gammas[best_k] if best_k>=0 else 0.0
-            f.write(f"{x},{pe:.12f},{px:.12f},{rem:.12f},{ratio:.12e},{T:.6f},{best_k+1}\n")
+            out.append(f"{x},{pe:.12f},{px:.12f},{rem:.12f},{ratio:.12e},{T:.6f},{best_k+1}\n")
+        return out
+    return header, rows
+
+def main():
+    ap=argparse.ArgumentParser()
+    ap.add_argument("--xmax", type=int, required=True)
+    ap.add_argument("--points", type=int, default=200)
+    ap.add_argument("--xmin", type=int, default=100)
+    ap.add_argument("--zeros", required=True)
+    ap.add_argument("--target", type=float, nargs="+", default=[1e-3], help="umbral(es) para el ratio")
+    ap.add_argument("--stream", action="store_true",
+                    help="busqueda k por bloques (k primero y k estable por target); ver --patience")
+    ap.add_argument("--chunk", type=int, default=1024, help="ceros por bloque en --stream")
+    ap.add_argument("--patience", type=int, default=0,
+                    help="--stream: cierra un target tras N bloques seguidos sin superarlo. Heuristico: "
+                         "k_stable_kind=heuristico en esas filas (0 = sin este corte)")
+    ap.add_argument("--out", required=True)
+    ps.add_psi_args(ap)
+    ck.add_checkpoint_args(ap)
+    args=ap.parse_args()
+    if not args.stream and len(args.target)!=1:
+        ap.error("varios --target requieren --stream")
+
+    gammas=read_gammas(args.zeros)
+    xs=make_x_points(args.xmax, args.points, args.xmin)
+    header, rows = (stream_rows if args.stream else basic_rows)(args, gammas, xs)
+    if args.checkpoint_every or args.resume:
+        ck.run_checkpointed(args, xs, header, lambda: ps.psi_from_args(args, xs, args.xmax), rows)
+        return
+    psi=ps.psi_from_args(args, xs, args.xmax)
+    with open(args.out,"w",encoding="utf-8") as f:
+        f.write(header)
+        for i in range(len(xs)):
+            f.writelines(rows(i, i+1, psi))
 
 if __name__=="__main__":
     main()
@@ -0,0 +1,112 @@
+# explicit_checkpoint.py
+# Checkpoint y reanudacion para los CSV por punto de los scripts explicit_*.
+# Las filas se escriben en <out>.part por tramos de --checkpoint_every x; tras cada
+# tramo (flush + fsync) se reemplaza atomicamente <out>.ckpt.json con los
+# parametros de la ejecucion, el sha256 del fichero de ceros, los x hechos y el
+# tamano en bytes de .part. psi en los x se guarda una vez en <out>.ckpt.psi.json,
+# asi que --resume no repite la criba. Al terminar .part pasa a <out> y se borran
+# los ficheros de checkpoint. Sin numpy (lo usa explicit_compare_npyfree.py).
+
+import hashlib, json, os, time
+
+CKPT_VERSION = 1
+PROGRESS_SECS = 30.0
+# opciones que no cambian las filas: pueden diferir entre la ejecucion y su reanudacion
+VOLATILE = {"resume", "checkpoint_every", "check", "plan", "workers", "xworkers",
+            "mem_budget", "calibration", "psi", "psi_table", "segment"}
+
+def file_sha256(path, chunk=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for b in iter(lambda: f.read(chunk), b""):
+            h.update(b)
+    return h.hexdigest()
+
+def run_params(args):
+    # parametros que determinan el CSV (en el orden de argparse no importa: se ordenan)
+    return {k: v for k, v in sorted(vars(args).items()) if k not in VOLATILE and not k.startswith("_")}
+
+def _write_atomic(path, obj):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f)
+        f.flush(); os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+class Checkpoint:
+    def __init__(self, out, params, zeros):
+        self.out = out
+        self.part = out + ".part"
+        self.path = out + ".ckpt.json"
+        self.psi_path = out + ".ckpt.psi.json"
+        self.params = params
+        self.zeros_sha = file_sha256(zeros)
+
+    def load(self):
+        # estado guardado o None; SystemExit si es de otra ejecucion
+        if not (os.path.exists(self.path) and os.path.exists(self.part) and os.path.exists(self.psi_path)):
+            return None
+        with open(self.path, "r", encoding="utf-8") as f:
+            st = json.load(f)
+        if st.get("version") != CKPT_VERSION:
+            raise SystemExit(f"{self.path}: version {st.get('version')} != {CKPT_VERSION}")
+        if st["zeros_sha256"] != self.zeros_sha:
+            raise SystemExit(f"{self.path}: el fichero de ceros ha cambiado desde el checkpoint")
+        diff = sorted(k for k in set(st["params"]) | set(self.params) if st["params"].get(k) != self.params.get(k))
+        if diff:
+            raise SystemExit(f"{self.path}: parametros distintos del checkpoint: "
+                             + ", ".join(f"{k}={st['params'].get(k)!r}->{self.params.get(k)!r}" for k in diff))
+        return st
+
+    def save(self, done, total, offset):
+        _write_atomic(self.path, {"version": CKPT_VERSION, "params": self.params, "zeros_sha256": self.zeros_sha,
+                                  "done": done, "total": total, "offset": offset, "time": time.time()})
+
+    def finish(self):
+        os.replace(self.part, self.out)
+        for p in (self.path, self.psi_path):
+            if os.path.exists(p): os.remove(p)
+
+def run_checkpointed(args, xs, header, psi_fn, rows_fn, every=None):
+    # Escribe args.out por tramos: rows_fn(i0, i1, psi) -> lineas CSV de xs[i0:i1].
+    # psi_fn() solo se llama si no hay checkpoint valido.
+    if getattr(args, "plan", False):
+        raise SystemExit("--plan no se combina con --checkpoint_every/--resume")
+    ck = Checkpoint(args.out, run_params(args), args.zeros)
+    st = ck.load() if args.resume else None
+    if st is None:
+        if args.resume:
+            print(f"[ckpt] sin checkpoint de {args.out}: se empieza de cero")
+        psi = psi_fn()
+        psi = {int(x): float(psi[x]) for x in xs}
+        _write_atomic(ck.psi_path, {str(x): v for x, v in psi.items()})
+        with open(ck.part, "w", encoding="utf-8") as f:
+            f.write(header)
+            f.flush(); os.fsync(f.fileno())
+            done, offset = 0, f.tell()
+        ck.save(done, len(xs), offset)
+    else:
+        with open(ck.psi_path, "r", encoding="utf-8") as f:
+            psi = {int(k): v for k, v in json.load(f).items()}
+        done, offset = st["done"], st["offset"]
+        print(f"[ckpt] reanudando {args.out}: {done}/{len(xs)} x hechos")
+    every = max(1, every or args.checkpoint_every or len(xs))
+    with open(ck.part, "r+b") as f:
+        f.seek(offset); f.truncate()   # filas de un tramo a medio escribir
+        t0 = tp = time.time()
+        for i0 in range(done, len(xs), every):
+            i1 = min(i0 + every, len(xs))
+            f.write("".join(rows_fn(i0, i1, psi)).encode("utf-8"))
+            f.flush(); os.fsync(f.fileno())
+            ck.save(i1, len(xs), f.tell())
+            if time.time() - tp >= PROGRESS_SECS:
+                tp = time.time()
+                print(f"[ckpt] {i1}/{len(xs)} x ({tp - t0:.0f} s)", flush=True)
+    ck.finish()
+    return psi
+
+def add_checkpoint_args(ap):
+    ap.add_argument("--checkpoint_every", type=int, default=0,
+                    help="x por tramo: filas a <out>.part y estado en <out>.ckpt.json tras cada tramo (0 = sin checkpoint)")
+    ap.add_argument("--resume", action="store_true",
+                    help="continua desde <out>.ckpt.json si los parametros y el hash de ceros coinciden")
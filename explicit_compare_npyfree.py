@@ -3,8 +3,14 @@
 # Compara psi_exact vs. f?rmula expl?cita truncada usando s?lo math (sin numpy).
 
 import argparse, math
+import explicit_engine as ee  # numpy solo si --engine numpy
+import psi_sieve as ps
+import zero_store
+import explicit_checkpoint as ck
 
 def read_gammas(path):
+    gs=zero_store.read_sorted(path, as_list=True)   # <path>.bin al dia: sin reparsear el texto
+    if gs is not None: return gs
     gs=[]
     with open(path,"r",encoding="utf-8-sig") as f:
         for s in f:
@@ -14,35 +20,6 @@ def read_gammas(path):
     gs.sort()
     return gs
 
-def psi_exact_upto(xmax):
-    # Von Mangoldt por SPF y acumulado: O(x log log x)
-    spf = list(range(xmax+1))
-    for i in range(2,int(xmax**0.5)+1):
-        if spf[i]==i:
-            step=i
-            start=i*i
-            for j in range(start, xmax+1, step):
-                if spf[j]==j:
-                    spf[j]=i
-    logp=[0.0]*(xmax+1)
-    for i in range(2,xmax+1):
-        if spf[i]==i:
-            logp[i]=math.log(i)
-    lam=[0.0]*(xmax+1)
-    for n in range(2,xmax+1):
-        p=spf[n]
-        m=n
-        while m%p==0:
-            m//=p
-        if m==1:           # n = p^k
-            lam[n]=logp[p]
-    psi=[0.0]*(xmax+1)
-    run=0.0
-    for n in range(1,xmax+1):
-        run+=lam[n]
-        psi[n]=run
-    return psi
-
 def psi_explicit_truncated(x, gammas, T):
     # psi ? x - ?_{|?|?T} 2 Re( x^{1/2+i?}/(1/2+i?) ) - log(2?) - 1/2 log(1 - x^{-2})
     L = math.log(x)
@@ -81,28 +58,47 @@ def main():
     ap.add_argument("--T_min", type=float, default=100.0, help="m?nimo T si usas sqrtx")
     ap.add_argument("--xmin", type=int, default=2, help="x m?nimo a evaluar")
     ap.add_argument("--out", required=True)
+    ee.add_engine_args(ap)
+    ps.add_psi_args(ap)
+    ck.add_checkpoint_args(ap)
     args=ap.parse_args()
 
     gammas=read_gammas(args.zeros)
     xmax=args.xmax
     xs=make_x_points(xmax, args.points, args.xmin)
-    psi=psi_exact_upto(xmax)
+    Ts=[]
+    for x in xs:
+        if args.T_mode=="constant":
+            T = args.T_const
+        else:
+            T = max(args.T_min, math.sqrt(x))
+        if len(gammas) and T>gammas[-1]:
+            T=gammas[-1]
+        Ts.append(T)
+    header=("x,psi_exact,psi_explicit,remainder psi_exact - explicit,ratio = |remainder|/(sqrt(x)*log(x)^2),T_used"
+            + (ee.CERT_HEADER if args.certified else "") + "\n")
 
-    with open(args.out,"w",encoding="utf-8") as f:
-        f.write("x,psi_exact,psi_explicit,remainder psi_exact - explicit,ratio = |remainder|/(sqrt(x)*log(x)^2),T_used\n")
-        for x in xs:
-            if args.T_mode=="constant":
-                T = args.T_const
-            else:
-                T = max(args.T_min, math.sqrt(x))
-            if gammas and T>gammas[-1]:
-                T=gammas[-1]
+    def rows(i0, i1, psi):
+        xb, Tb = xs[i0:i1], Ts[i0:i1]
+        pxs = ee.explicit_values(xb, gammas, Tb, args, psi_explicit_truncated)
+        cert = ee.certified_columns(args, xb, gammas, Tb, psi, pxs)
+        out=[]
+        for i, (x, T, px) in enumerate(zip(xb, Tb, pxs)):
             pe = psi[x]
-            px = psi_explicit_truncated(x, gammas, T)
             rem = pe - px
             denom = math.sqrt(x)*(math.log(x)**2)
             ratio = abs(rem)/denom if denom>0 else 0.0
-            f.write(f"{x},{pe:.12f},{px:.12f},{rem:.12f},{ratio:.12e},{T:.0f}\n")
+            out.append(f"{x},{pe:.12f},{px:.12f},{rem:.12f},{ratio:.12e},{T:.0f}" + (cert[i] if cert else "") + "\n")
+        return out
+
+    if args.checkpoint_every or args.resume:
+        ck.run_checkpointed(args, xs, header, lambda: ps.psi_from_args(args, xs, xmax), rows)
+        return
+    psi=ps.psi_from_args(args, xs, xmax)
+    lines=rows(0, len(xs), psi)
+    with open(args.out,"w",encoding="utf-8") as f:
+        f.write(header)
+        f.writelines(lines)
 
 if __name__=="__main__":
     main()
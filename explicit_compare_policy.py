@@ -3,8 +3,14 @@
 # Igual que explicit_compare_npyfree.py, con modo T_mode="policy"
 
 import argparse, math
+import explicit_engine as ee
+import psi_sieve as ps
+import zero_store
+import explicit_checkpoint as ck
 
 def read_gammas(path):
+    gs=zero_store.read_sorted(path)   # <path>.bin al dia: sin reparsear el texto
+    if gs is not None: return gs
     gs=[]
     with open(path,"r",encoding="utf-8-sig") as f:
         for s in f:
@@ -13,25 +19,6 @@ def read_gammas(path):
     gs.sort()
     return gs
 
-def psi_exact_upto(xmax):
-    spf = list(range(xmax+1))
-    for i in range(2,int(xmax**0.5)+1):
-        if spf[i]==i:
-            for j in range(i*i, xmax+1, i):
-                if spf[j]==j: spf[j]=i
-    logp=[0.0]*(xmax+1)
-    for i in range(2,xmax+1):
-        if spf[i]==i: logp[i]=math.log(i)
-    lam=[0.0]*(xmax+1)
-    for n in range(2,xmax+1):
-        p=spf[n]; m=n
-        while m%p==0: m//=p
-        if m==1: lam[n]=logp[p]
-    psi=[0.0]*(xmax+1); run=0.0
-    for n in range(1,xmax+1):
-        run+=lam[n]; psi[n]=run
-    return psi
-
 def psi_explicit_truncated(x, gammas, T):
     L = math.log(x)
     sq = math.sqrt(x)
@@ -68,37 +55,55 @@ def main():
     ap.add_argument("--T_min", type=float, default=100.0, help="m?nimo T si usas sqrtx")
     ap.add_argument("--xmin", type=int, default=2, help="x m?nimo a evaluar")
     ap.add_argument("--out", required=True)
+    ee.add_engine_args(ap)
+    ps.add_psi_args(ap)
+    ck.add_checkpoint_args(ap)
     args=ap.parse_args()
 
     gammas=read_gammas(args.zeros)
     xmax=args.xmax
     xs=make_x_points(xmax, args.points, args.xmin)
-    psi=psi_exact_upto(xmax)
-
-    with open(args.out,"w",encoding="utf-8") as f:
-        f.write("x,psi_exact,psi_explicit,remainder psi_exact - explicit,ratio = |remainder|/(sqrt(x)*log(x)^2),T_used\n")
-        for x in xs:
-            # Selecci?n de T
-            if args.T_mode=="constant":
-                T = args.T_const
-            elif args.T_mode=="sqrtx":
-                T = max(args.T_min, math.sqrt(x))
-            else:  # policy
-                if x < 500:
-                    T = max(700.0, math.sqrt(x))
-                elif x < 3000:
-                    T = 2000.0
-                else:
-                    T = 5000.0
-            if gammas and T>gammas[-1]:
-                T=gammas[-1]
+    Ts=[]
+    for x in xs:
+        # Selecci?n de T
+        if args.T_mode=="constant":
+            T = args.T_const
+        elif args.T_mode=="sqrtx":
+            T = max(args.T_min, math.sqrt(x))
+        else:  # policy
+            if x < 500:
+                T = max(700.0, math.sqrt(x))
+            elif x < 3000:
+                T = 2000.0
+            else:
+                T = 5000.0
+        if len(gammas) and T>gammas[-1]:
+            T=gammas[-1]
+        Ts.append(T)
+    header=("x,psi_exact,psi_explicit,remainder psi_exact - explicit,ratio = |remainder|/(sqrt(x)*log(x)^2),T_used"
+            + (ee.CERT_HEADER if args.certified else "") + "\n")
 
+    def rows(i0, i1, psi):
+        xb, Tb = xs[i0:i1], Ts[i0:i1]
+        pxs = ee.explicit_values(xb, gammas, Tb, args, psi_explicit_truncated)
+        cert = ee.certified_columns(args, xb, gammas, Tb, psi, pxs)
+        out=[]
+        for i, (x, T, px) in enumerate(zip(xb, Tb, pxs)):
             pe = psi[x]
-            px = psi_explicit_truncated(x, gammas, T)
             rem = pe - px
             denom = math.sqrt(x)*(math.log(x)**2)
             ratio = abs(rem)/denom if denom>0 else 0.0
-            f.write(f"{x},{pe:.12f},{px:.12f},{rem:.12f},{ratio:.12e},{T:.0f}\n")
+            out.append(f"{x},{pe:.12f},{px:.12f},{rem:.12f},{ratio:.12e},{T:.0f}" + (cert[i] if cert else "") + "\n")
+        return out
+
+    if args.checkpoint_every or args.resume:
+        ck.run_checkpointed(args, xs, header, lambda: ps.psi_from_args(args, xs, xmax), rows)
+        return
+    psi=ps.psi_from_args(args, xs, xmax)
+    lines=rows(0, len(xs), psi)
+    with open(args.out,"w",encoding="utf-8") as f:
+        f.write(header)
+        f.writelines(lines)
 
 if __name__=="__main__":
     main()
@@ -1,7 +1,17 @@
 ﻿# explicit_compare_policy_param.py
 import argparse, math
+import explicit_engine as ee
+import psi_sieve as ps
+import zero_store
+import explicit_smooth as sm
+import explicit_functions as ef
+import explicit_ensemble as ens
+import explicit_shard as sh
+import explicit_checkpoint as ck
 
 def read_gammas(path):
+    gs=zero_store.read_sorted(path)   # <path>.bin al dia: sin reparsear el texto
+    if gs is not None: return gs
     gs=[]
     with open(path,"r",encoding="utf-8-sig") as f:
         for s in f:
@@ -9,25 +19,6 @@ def read_gammas(path):
             if s: gs.append(float(s))
     gs.sort(); return gs
 
-def psi_exact_upto(xmax):
-    spf=list(range(xmax+1))
-    for i in range(2,int(xmax**0.5)+1):
-        if spf[i]==i:
-            for j in range(i*i, xmax+1, i):
-                if spf[j]==j: spf[j]=i
-    logp=[0.0]*(xmax+1)
-    for i in range(2,xmax+1):
-        if spf[i]==i: logp[i]=math.log(i)
-    lam=[0.0]*(xmax+1)
-    for n in range(2,xmax+1):
-        p=spf[n]; m=n
-        while m%p==0: m//=p
-        if m==1: lam[n]=logp[p]
-    psi=[0.0]*(xmax+1); run=0.0
-    for n in range(1,xmax+1):
-        run+=lam[n]; psi[n]=run
-    return psi
-
 def psi_explicit_truncated(x, gammas, T):
     L=math.log(x); sq=math.sqrt(x); S=0.0
     for g in gammas:
@@ -38,6 +29,16 @@ def psi_explicit_truncated(x, gammas, T):
     tail = math.log(2.0*math.pi) + 0.5*math.log(1.0 - x**-2)
     return x - S - tail
 
+def policy_T(x, b1, b2, Tmin_low, T_mid, T_high, gammas):
+    if x < b1:
+        T = max(Tmin_low, math.sqrt(x))
+    elif x < b2:
+        T = T_mid
+    else:
+        T = T_high
+    if len(gammas) and T>gammas[-1]: T=gammas[-1]
+    return T
+
 def make_x_points(xmax, k, xmin=2):
     xmin=max(2,int(xmin))
     if k<=1: return [max(xmin,xmax)]
@@ -62,27 +63,298 @@ def main():
     ap.add_argument("--T_mid", type=float, default=2000.0)
     ap.add_argument("--T_high", type=float, default=5000.0)
     ap.add_argument("--out", required=True)
+    # Barrido de pol?ticas: listas separadas por comas (producto cartesiano)
+    ap.add_argument("--sweep", action="store_true", help="eval?a una rejilla de pol?ticas en una pasada")
+    ap.add_argument("--grid_b1", default=None, help="ej. 300,500 (por defecto --b1)")
+    ap.add_argument("--grid_b2", default=None)
+    ap.add_argument("--grid_Tmin_low", default=None)
+    ap.add_argument("--grid_T_mid", default=None)
+    ap.add_argument("--grid_T_high", default=None)
+    ap.add_argument("--sweep_rank", choices=["MaxRatio","P95","P90","Median","Mean"], default="MaxRatio",
+                    help="m?trica para elegir la mejor pol?tica (desempate: P95, ceros medios)")
+    ap.add_argument("--sweep_out", default=None, help="tabla resumen (por defecto <out>_sweep.csv)")
+    # Barrido denso: todo entero de [xmin, xmax] y el limite por la izquierda en cada potencia de primo
+    ap.add_argument("--scan", action="store_true", help="eval?a todos los enteros (sin CSV por punto)")
+    ap.add_argument("--scan_topk", type=int, default=20, help="peores puntos que se guardan")
+    ap.add_argument("--scan_chunk", type=int, default=1<<16, help="x por bloque del motor explicito")
+    ap.add_argument("--scan_out", default=None, help="resumen JSON (por defecto <out>_scan.json)")
+    ee.add_engine_args(ap)
+    ps.add_psi_args(ap)
+    sm.add_smooth_args(ap)
+    ap.add_argument("--tail", choices=["none","density"], default="none",
+                    help="density: resta la cola g>T estimada con la densidad de ceros (columnas extra); "
+                         "tail_expansion_rem es solo el resto de la expansion, sin la fluctuacion S(t)")
+    ens.add_ensemble_args(ap)
+    ap.add_argument("--functions", default="psi",
+                    help="lista psi,theta,pi: una pasada de fases; theta/pi van a <out>_theta.csv, <out>_pi.csv")
+    sh.add_shard_args(ap)
+    ck.add_checkpoint_args(ap)
     args=ap.parse_args()
+    if args.scan_topk < 1:
+        ap.error("--scan_topk debe ser >= 1")
+    funcs=[f.strip() for f in args.functions.split(",") if f.strip()]
+    if not funcs or any(f not in ef.FUNCTIONS for f in funcs):
+        raise SystemExit(f"--functions: elige entre {','.join(ef.FUNCTIONS)}")
 
     gammas=read_gammas(args.zeros)
+    if args.certified and (args.scan or args.sweep or args.smooth != "none"):
+        raise SystemExit("--certified solo en el modo por puntos (sin --scan/--sweep/--smooth)")
+    if funcs != ["psi"] and (args.scan or args.sweep or args.smooth != "none" or args.certified or args.tail != "none"):
+        raise SystemExit("--functions theta/pi solo en el modo por puntos basico")
+    if args.tail != "none" and (args.scan or args.smooth != "none"):
+        raise SystemExit("--tail no se combina con --scan ni --smooth")
+    if args.plan and (args.scan or args.sweep or args.smooth != "none" or funcs != ["psi"]):
+        raise SystemExit("--plan solo en el modo por puntos basico")
+    if (args.shard or args.merge) and (args.scan or args.sweep or args.smooth != "none" or funcs != ["psi"]
+                                       or args.certified or args.tail != "none" or args.ensemble or args.plan):
+        raise SystemExit("--shard/--merge solo en el modo por puntos basico")
+    if args.shard and args.merge:
+        raise SystemExit("--shard y --merge son pasos distintos")
+    if (args.checkpoint_every or args.resume) and (args.scan or args.sweep or args.smooth != "none" or funcs != ["psi"]
+                                                   or args.ensemble or args.shard or args.merge or args.plan):
+        raise SystemExit("--checkpoint_every/--resume solo en el modo por puntos basico")
+    if args.scan:
+        run_scan(args, gammas)
+        return
     xs=make_x_points(args.xmax, args.points, args.xmin)
-    psi=psi_exact_upto(args.xmax)
-
-    with open(args.out,"w",encoding="utf-8") as f:
-        f.write("x,psi_exact,psi_explicit,remainder psi_exact - explicit,ratio = |remainder|/(sqrt(x)*log(x)^2),T_used\n")
-        for x in xs:
-            if x < args.b1:
-                T = max(args.Tmin_low, math.sqrt(x))
-            elif x < args.b2:
-                T = args.T_mid
+    if args.mem_budget and (args.shard or args.sweep or funcs != ["psi"] or args.smooth != "none"):
+        # estos modos recorren teselas numpy sea cual sea --engine
+        import engine_plan
+        engine_plan.apply_mem_budget(args, "numpy")
+    if args.shard:
+        sh.run_shard(args, gammas, xs, [policy_T(x, args.b1, args.b2, args.Tmin_low, args.T_mid, args.T_high, gammas) for x in xs])
+        return
+    if args.checkpoint_every or args.resume:
+        run_checkpointed(args, gammas, xs)
+        return
+    psi=ps.psi_from_args(args, xs, args.xmax)
+
+    if args.sweep:
+        run_sweep(args, gammas, xs, psi)
+        return
+
+    Ts=[policy_T(x, args.b1, args.b2, args.Tmin_low, args.T_mid, args.T_high, gammas) for x in xs]
+    if funcs != ["psi"]:
+        run_functions(args, funcs, gammas, xs, Ts, psi)
+        return
+    if args.smooth != "none":
+        # psi_exact / psi_explicit del CSV pasan a ser los dos lados de Psi_delta(x)
+        pxs, psi = sm.smoothed_values(xs, gammas, Ts, psi, args)
+    elif args.merge:
+        pxs=sh.merge_shards(args, gammas, xs, Ts)
+    else:
+        pxs=ee.explicit_values(xs, gammas, Ts, args, psi_explicit_truncated)
+    write_csv(args.out, xs, Ts, pxs, psi, ee.certified_columns(args, xs, gammas, Ts, psi, pxs),
+              tail_columns(args, xs, gammas, Ts, pxs, psi))
+    if args.ensemble > 0 and args.smooth == "none":
+        ens.run_ensemble(args, gammas, xs, Ts, pxs, psi)
+
+def run_checkpointed(args, gammas, xs):
+    # modo por puntos en tramos de --checkpoint_every x (mismo CSV que write_csv)
+    Ts=[policy_T(x, args.b1, args.b2, args.Tmin_low, args.T_mid, args.T_high, gammas) for x in xs]
+
+    def rows(i0, i1, psi):
+        xb, Tb = xs[i0:i1], Ts[i0:i1]
+        pxs=ee.explicit_values(xb, gammas, Tb, args, psi_explicit_truncated)
+        return csv_rows(xb, Tb, pxs, psi, ee.certified_columns(args, xb, gammas, Tb, psi, pxs),
+                        tail_columns(args, xb, gammas, Tb, pxs, psi))
+    ck.run_checkpointed(args, xs, csv_header(args.certified, args.tail != "none"),
+                        lambda: ps.psi_from_args(args, xs, args.xmax), rows)
+
+# tail_expansion_rem acota solo el resto de la integracion por partes de tail_density;
+# NO es una barra de error de tail_est: la fluctuacion S(t) del conteo de ceros, que
+# domina (~1e-2 en x = 100 frente a ~3e-7), no entra. psi_explicit_tail no es por
+# tanto mas preciso que el valor truncado.
+TAIL_HEADER = ",tail_est,tail_expansion_rem,psi_explicit_tail,ratio_tail"
+
+def tail_columns(args, xs, gammas, Ts, pxs, psi):
+    # sufijos con la cola g>T estimada, el resto de su expansion y el psi/ratio corregidos
+    if args.tail == "none":
+        return None
+    out = []
+    for x, T, px in zip(xs, Ts, pxs):
+        t, e = ee.tail_density(x, gammas, T)
+        pc = px - t
+        ratio = abs(psi[x] - pc)/(math.sqrt(x)*(math.log(x)**2))
+        out.append(f",{t:.12f},{e:.3e},{pc:.12f},{ratio:.12e}")
+    return out
+
+def csv_header(cert=False, tail=False):
+    return ("x,psi_exact,psi_explicit,remainder psi_exact - explicit,ratio = |remainder|/(sqrt(x)*log(x)^2),T_used"
+            + (TAIL_HEADER if tail else "") + (ee.CERT_HEADER if cert else "") + "\n")
+
+def csv_rows(xs, Ts, pxs, psi, cert=None, tail=None):
+    out = []
+    for i, (x, T, px) in enumerate(zip(xs, Ts, pxs)):
+        pe=psi[x]
+        rem=pe-px; denom=math.sqrt(x)*(math.log(x)**2)
+        ratio = abs(rem)/denom if denom>0 else 0.0
+        out.append(f"{x},{pe:.12f},{px:.12f},{rem:.12f},{ratio:.12e},{T:.0f}"
+                   + (tail[i] if tail else "") + (cert[i] if cert else "") + "\n")
+    return out
+
+def write_csv(path, xs, Ts, pxs, psi, cert=None, tail=None):
+    with open(path,"w",encoding="utf-8") as f:
+        f.write(csv_header(cert, tail))
+        f.writelines(csv_rows(xs, Ts, pxs, psi, cert, tail))
+
+def run_functions(args, funcs, gammas, xs, Ts, psi):
+    # psi/theta/pi explicitos desde las mismas fases; theta y pi exactos de una criba de primos
+    vals = ef.explicit_functions(xs, gammas, Ts, funcs, args.xblock, args.zblock)
+    theta, pi = ps.theta_pi_at(xs, args.xmax) if ("theta" in funcs or "pi" in funcs) else (None, None)
+    base = args.out.rsplit(".", 1)[0]
+    for fn in funcs:
+        if fn == "psi":
+            write_csv(args.out, xs, Ts, vals["psi"], psi)
+            print(args.out)
+            continue
+        exact = theta if fn == "theta" else pi
+        # pi: el resto es del orden del de psi dividido por log x
+        dname, dpow = ("sqrt(x)*log(x)^2", 2) if fn == "theta" else ("sqrt(x)*log(x)", 1)
+        path = f"{base}_{fn}.csv"
+        with open(path,"w",encoding="utf-8") as f:
+            f.write(f"x,{fn}_exact,{fn}_explicit,remainder {fn}_exact - explicit,ratio = |remainder|/({dname}),"
+                    f"T_used (ceros en x^(1/k) solo k<={ef.ZERO_K})\n")
+            for x, T, px in zip(xs, Ts, vals[fn]):
+                pe = exact[x]; rem = pe - px
+                ratio = abs(rem)/(math.sqrt(x)*math.log(x)**dpow)
+                f.write(f"{x},{pe:.12f},{px:.12f},{rem:.12f},{ratio:.12e},{T:.0f}\n")
+        print(path)
+
+def run_sweep(args, gammas, xs, psi):
+    # Una sola pasada: sumas parciales acumuladas por x en todos los cortes de la rejilla
+    import itertools
+    import numpy as np
+    grid = lambda s, base, typ: [base] if s is None else [typ(v) for v in s.split(",") if v.strip()]
+    pols = list(itertools.product(grid(args.grid_b1, args.b1, int), grid(args.grid_b2, args.b2, int),
+                                  grid(args.grid_Tmin_low, args.Tmin_low, float),
+                                  grid(args.grid_T_mid, args.T_mid, float),
+                                  grid(args.grid_T_high, args.T_high, float)))
+    Ts = np.array([[policy_T(x, *pol, gammas) for pol in pols] for x in xs])
+    K = ee.cutoff_index(gammas, Ts.ravel()).reshape(Ts.shape)
+    S = ee.explicit_sums_multi(xs, gammas, K, args.xblock, args.zblock)
+    pe = np.array([psi[x] for x in xs])
+    tail = np.array([x - math.log(2.0*math.pi) - 0.5*math.log(1.0 - x**-2) for x in xs])
+    denom = np.array([math.sqrt(x)*(math.log(x)**2) for x in xs])
+    PX = tail[:, None] - S
+    PXc = PX
+    if args.tail == "density":
+        # la politica se elige con el psi corregido por la cola analitica
+        PXc = PX - np.array([[ee.tail_density(x, gammas, T)[0] for T in row] for x, row in zip(xs, Ts)])
+    R = np.abs(pe[:, None] - PXc)/denom[:, None]
+
+    rows = []
+    for m, pol in enumerate(pols):
+        st = ee.ratio_summary(xs, R[:, m])
+        st["mean_zeros"] = float(K[:, m].mean())
+        rows.append((pol, st))
+    best = min(range(len(rows)), key=lambda m: (rows[m][1][args.sweep_rank], rows[m][1]["P95"], rows[m][1]["mean_zeros"]))
+
+    sweep_out = args.sweep_out or (args.out.rsplit(".", 1)[0] + "_sweep.csv")
+    with open(sweep_out,"w",encoding="utf-8") as f:
+        f.write("b1,b2,Tmin_low,T_mid,T_high,Points,MaxRatio,x_at_max,Median,P90,P95,Mean,lt5e-3,lt1e-3,mean_zeros,best\n")
+        for m, (pol, st) in enumerate(rows):
+            f.write(f"{pol[0]},{pol[1]},{pol[2]:g},{pol[3]:g},{pol[4]:g},{st['Points']},{st['MaxRatio']:.6e},{st['x_at_max']},"
+                    f"{st['Median']:.6e},{st['P90']:.6e},{st['P95']:.6e},{st['Mean']:.6e},{st['lt5e-3']},{st['lt1e-3']},"
+                    f"{st['mean_zeros']:.1f},{int(m==best)}\n")
+    write_csv(args.out, xs, Ts[:, best], PX[:, best], psi,
+              tail=tail_columns(args, xs, gammas, Ts[:, best], PX[:, best], psi))
+    pol, st = rows[best]
+    print(f"[sweep] {len(pols)} pol?ticas; mejor b1={pol[0]} b2={pol[1]} Tmin_low={pol[2]:g} T_mid={pol[3]:g} T_high={pol[4]:g}"
+          f"  MaxRatio={st['MaxRatio']:.3e} @ x={st['x_at_max']}  P95={st['P95']:.3e}")
+    print(sweep_out)
+
+def policy_T_vec(xs, b1, b2, Tmin_low, T_mid, T_high, gammas):
+    # policy_T sobre un array de x
+    import numpy as np
+    T = np.where(xs < b1, np.maximum(Tmin_low, np.sqrt(xs)), np.where(xs < b2, float(T_mid), float(T_high)))
+    return np.minimum(T, gammas[-1]) if len(gammas) else T
+
+# Cuantiles aproximados: histograma de log10(ratio) con SCAN_BINS bins por decada
+SCAN_LO, SCAN_HI, SCAN_BINS = -16, 2, 100
+
+def run_scan(args, gammas):
+    # psi por segmentos (acumulado secuencial, igual que la criba densa), suma explicita
+    # por bloques vectorizados; estadisticas en memoria acotada: max, media, conteos,
+    # histograma logaritmico para cuantiles y los top-K peores puntos.
+    import json
+    import numpy as np
+    if args.mem_budget:
+        import engine_plan
+        engine_plan.apply_mem_budget(args, "nufft" if args.engine == "nufft" else "numpy")
+    xmin, xmax = max(2, int(args.xmin)), int(args.xmax)
+    coeffs = ee.zero_coeffs(gammas)
+    base = ps.primes_upto(math.isqrt(xmax))
+    nb = (SCAN_HI - SCAN_LO)*SCAN_BINS
+    hist = np.zeros(nb + 1, dtype=np.int64)   # ultimo bin: ratio == 0
+    st = {"integers": 0, "left_limits": 0, "sum": 0.0, "lt5e-3": 0, "lt1e-3": 0}
+    top = np.zeros((0, 6))   # ratio, x, lado (1 = limite izquierdo), psi, explicito, T
+    K = args.scan_topk
+    last = 0.0
+    for lo in range(2, xmax+1, args.segment):
+        hi = min(lo + args.segment, xmax+1)
+        lam = ps.segment_lambda(lo, hi, base)
+        cum = np.cumsum(np.concatenate(([last], lam)))
+        last = float(cum[-1])
+        for c0 in range(max(lo, xmin), hi, args.scan_chunk):
+            c1 = min(c0 + args.scan_chunk, hi)
+            x = np.arange(c0, c1, dtype=np.float64)
+            T = policy_T_vec(x, args.b1, args.b2, args.Tmin_low, args.T_mid, args.T_high, gammas)
+            ks = ee.cutoff_index(gammas, T)
+            xl = list(range(c0, c1))
+            if args.engine == "nufft":
+                S = ee.explicit_sums_nufft(xl, gammas, ks, args.nufft_tol, args.xblock, args.zblock)
             else:
-                T = args.T_high
-            if gammas and T>gammas[-1]: T=gammas[-1]
+                S = ee.explicit_sums(xl, gammas, ks, args.xblock, args.zblock, coeffs)
+            px = x - S - (math.log(2.0*math.pi) + 0.5*np.log(1.0 - x**-2))
+            denom = np.sqrt(x)*np.log(x)**2
+            pe = cum[c0-lo+1:c1-lo+1]
+            pp = np.nonzero(lam[c0-lo:c1-lo])[0]
+            # limite izquierdo en potencias de primo: psi(n-1) frente al explicito en n
+            pe_all = np.concatenate((pe, cum[c0-lo+pp]))
+            px_all = np.concatenate((px, px[pp]))
+            r = np.abs(pe_all - px_all)/np.concatenate((denom, denom[pp]))
+            xs_all = np.concatenate((x, x[pp]))
+            side = np.concatenate((np.zeros(x.size), np.ones(pp.size)))
+            st["integers"] += x.size; st["left_limits"] += pp.size
+            st["sum"] += math.fsum(r.tolist())
+            st["lt5e-3"] += int((r < 5e-3).sum()); st["lt1e-3"] += int((r < 1e-3).sum())
+            with np.errstate(divide="ignore"):
+                b = np.floor((np.log10(r) - SCAN_LO)*SCAN_BINS)
+            b = np.where(r > 0, np.clip(b, 0, nb-1), nb).astype(np.int64)
+            hist += np.bincount(b, minlength=nb+1)
+            sel = np.argpartition(-r, K-1)[:K] if r.size > K else np.arange(r.size)
+            cand = np.column_stack((r[sel], xs_all[sel], side[sel], pe_all[sel], px_all[sel], np.concatenate((T, T[pp]))[sel]))
+            top = np.concatenate((top, cand))
+            top = top[np.argsort(-top[:, 0], kind="stable")[:K]]
 
-            pe=psi[x]; px=psi_explicit_truncated(x, gammas, T)
-            rem=pe-px; denom=math.sqrt(x)*(math.log(x)**2)
-            ratio = abs(rem)/denom if denom>0 else 0.0
-            f.write(f"{x},{pe:.12f},{px:.12f},{rem:.12f},{ratio:.12e},{T:.0f}\n")
+    n = st["integers"] + st["left_limits"]
+    def q(p):
+        # bin que contiene el rango round(p*(n-1)); se devuelve su centro geometrico
+        k = int(round(p*(n-1)))
+        i = int(np.searchsorted(np.cumsum(hist), k, side="right"))
+        return 0.0 if i >= nb else 10.0**(SCAN_LO + (i + 0.5)/SCAN_BINS)
+    summary = {
+        "xmin": xmin, "xmax": xmax, "zeros": args.zeros,
+        "policy": {"b1": args.b1, "b2": args.b2, "Tmin_low": args.Tmin_low, "T_mid": args.T_mid, "T_high": args.T_high},
+        "engine": args.engine,
+        "Points": n, "integers": st["integers"], "left_limits": st["left_limits"],
+        "MaxRatio": float(top[0, 0]) if n else 0.0,
+        "x_at_max": int(top[0, 1]) if n else None,
+        "side_at_max": ("left" if top[0, 2] else "exact") if n else None,
+        "Median": q(0.5), "P90": q(0.9), "P95": q(0.95),
+        "quantile_rel_err": 10.0**(0.5/SCAN_BINS) - 1.0,
+        "Mean": st["sum"]/n if n else 0.0,
+        "lt5e-3": st["lt5e-3"], "lt1e-3": st["lt1e-3"],
+        "top": [{"x": int(t[1]), "side": "left" if t[2] else "exact", "psi_exact": float(t[3]),
+                 "psi_explicit": float(t[4]), "ratio": float(t[0]), "T_used": float(t[5])} for t in top],
+    }
+    scan_out = args.scan_out or (args.out.rsplit(".", 1)[0] + "_scan.json")
+    with open(scan_out, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    print(f"[scan] {n} puntos ({st['left_limits']} limites izquierdos)  MaxRatio={summary['MaxRatio']:.3e}"
+          f" @ x={summary['x_at_max']} ({summary['side_at_max']})  P95~{summary['P95']:.3e}")
+    print(scan_out)
 
 if __name__=="__main__":
     main()
@@ -0,0 +1,647 @@
+# explicit_engine.py
+# Motor NumPy por bloques para la suma truncada de la formula explicita:
+#   S_T(x) = sum_{0<g<=T} 2*sqrt(x)*(0.5*cos(g*log x) + g*sin(g*log x))/(0.25+g^2)
+# Evalua un bloque de x contra un bloque de ceros a la vez; el corte T de
+# cada x se traduce en un indice prefijo k_x (ceros g_j con j<k_x) y se
+# aplica con mascara solo en la tesela que lo contiene.
+
+import math
+import zero_store
+try:
+    import numpy as np
+except ImportError:  # explicit_compare_npyfree.py debe seguir corriendo sin numpy
+    np = None
+
+# Teselas de XBLOCK x ZBLOCK float64 = 64*2048*8 B = 1 MiB por matriz temporal
+XBLOCK = 64
+ZBLOCK = 2048
+
+def zero_coeffs(gammas):
+    # a_j = 0.5/(1/4+g^2), b_j = g/(1/4+g^2); del .bin de zero_store si gammas viene de alli
+    c = zero_store.coeffs_for(gammas)
+    if c is not None:
+        return c
+    g = np.asarray(gammas, dtype=np.float64)
+    den = 0.25 + g*g
+    return g, 0.5/den, g/den
+
+def cutoff_index(gammas, Ts):
+    # k_x = #{g <= T_x}: mismo criterio que el 'break' de psi_explicit_truncated
+    g = np.asarray(gammas, dtype=np.float64)
+    return np.searchsorted(g, np.asarray(Ts, dtype=np.float64), side="right")
+
+def explicit_sums(xs, gammas, ks, xblock=XBLOCK, zblock=ZBLOCK, coeffs=None):
+    # S[i] = sum_{j<ks[i]} 2*sqrt(x_i)*(a_j*cos(g_j*L_i) + b_j*sin(g_j*L_i))
+    xs = list(xs)
+    ks = np.asarray(ks, dtype=np.int64)
+    g, a, b = zero_coeffs(gammas) if coeffs is None else coeffs
+    # log/sqrt por x con math, igual que el camino escalar
+    L = np.array([math.log(x) for x in xs], dtype=np.float64)
+    sq = np.array([math.sqrt(x) for x in xs], dtype=np.float64)
+    out = np.zeros(len(xs))
+    for i0 in range(0, len(xs), xblock):
+        i1 = min(i0+xblock, len(xs))
+        Lb = L[i0:i1, None]
+        kb = ks[i0:i1]
+        kmin, kmax = int(kb.min()), int(kb.max())
+        acc = np.zeros(i1-i0)
+        for j0 in range(0, kmax, zblock):
+            j1 = min(j0+zblock, kmax)
+            ph = Lb*g[j0:j1]
+            t = a[j0:j1]*np.cos(ph) + b[j0:j1]*np.sin(ph)
+            if j1 > kmin:
+                t[np.arange(j0, j1)[None, :] >= kb[:, None]] = 0.0
+            acc += t.sum(axis=1)
+        out[i0:i1] = 2.0*sq[i0:i1]*acc
+    return out
+
+def explicit_sums_many(xs, gammas, ks, coeff_sets, xblock=XBLOCK, zblock=ZBLOCK):
+    # Varios juegos (a, b) sobre las mismas fases: cos/sin de cada tesela se calculan
+    # una vez. Devuelve S[m, i] = 2*sqrt(x_i) * sum_{j<ks[i]} (a_mj cos + b_mj sin).
+    xs = list(xs)
+    ks = np.asarray(ks, dtype=np.int64)
+    g = np.asarray(gammas, dtype=np.float64)
+    L = np.array([math.log(x) for x in xs], dtype=np.float64)
+    sq = np.array([math.sqrt(x) for x in xs], dtype=np.float64)
+    out = np.zeros((len(coeff_sets), len(xs)))
+    for i0 in range(0, len(xs), xblock):
+        i1 = min(i0+xblock, len(xs))
+        Lb = L[i0:i1, None]
+        kb = ks[i0:i1]
+        kmin, kmax = int(kb.min()), int(kb.max())
+        acc = np.zeros((len(coeff_sets), i1-i0))
+        for j0 in range(0, kmax, zblock):
+            j1 = min(j0+zblock, kmax)
+            ph = Lb*g[j0:j1]
+            c, s = np.cos(ph), np.sin(ph)
+            mask = np.arange(j0, j1)[None, :] >= kb[:, None] if j1 > kmin else None
+            for m, (a, b) in enumerate(coeff_sets):
+                t = a[j0:j1]*c + b[j0:j1]*s
+                if mask is not None: t[mask] = 0.0
+                acc[m] += t.sum(axis=1)
+        out[:, i0:i1] = 2.0*sq[i0:i1]*acc
+    return out
+
+def explicit_sums_multi(xs, gammas, K, xblock=XBLOCK, zblock=ZBLOCK):
+    # Varios cortes por x de una pasada: S[i,m] = suma de los primeros K[i,m] terminos.
+    # Las sumas parciales acumuladas (cumsum, mismo orden que el bucle escalar)
+    # se recorren una vez hasta max(K[i,:]) y cada corte se lee por prefijo.
+    xs = list(xs)
+    K = np.asarray(K, dtype=np.int64).reshape(len(xs), -1)
+    g, a, b = zero_coeffs(gammas)
+    L = np.array([math.log(x) for x in xs], dtype=np.float64)
+    sq = np.array([math.sqrt(x) for x in xs], dtype=np.float64)
+    out = np.zeros(K.shape)
+    for i0 in range(0, len(xs), xblock):
+        i1 = min(i0+xblock, len(xs))
+        Lb = L[i0:i1, None]
+        Kb = K[i0:i1]
+        carry = np.zeros(i1-i0)
+        for j0 in range(0, int(Kb.max()), zblock):
+            j1 = min(j0+zblock, int(Kb.max()))
+            ph = Lb*g[j0:j1]
+            c = np.cumsum(a[j0:j1]*np.cos(ph) + b[j0:j1]*np.sin(ph), axis=1)
+            c += carry[:, None]
+            r, m = np.nonzero((Kb > j0) & (Kb <= j1))
+            out[i0+r, m] = c[r, Kb[r, m]-j0-1]
+            carry = c[:, -1]
+        out[i0:i1] *= 2.0*sq[i0:i1, None]
+    return out
+
+def ratio_summary(xs, ratios):
+    # Metricas del README: cuantiles por rango sorted[round(p*(n-1))]
+    r = np.asarray(ratios, dtype=np.float64)
+    n = r.size
+    if n == 0:
+        return {"Points": 0}
+    srt = np.sort(r)
+    q = lambda p: float(srt[int(round(p*(n-1)))])
+    imax = int(np.argmax(r))
+    return {
+        "Points": n,
+        "MaxRatio": float(r[imax]), "x_at_max": xs[imax],
+        "Median": q(0.5), "P90": q(0.9), "P95": q(0.95),
+        "Mean": float(r.mean()),
+        "lt5e-3": int((r < 5e-3).sum()), "lt1e-3": int((r < 1e-3).sum()),
+    }
+
+def grid_indices(xs, xmax, k, xmin=2):
+    # Indice i de la rejilla log-uniforme de make_x_points para cada x (primera
+    # aparicion, como la deduplicacion de make_x_points) y su punto ideal G_i
+    xmin=max(2,int(xmin))
+    L0, L1 = math.log(float(xmin)), math.log(float(xmax))
+    first = {}
+    for i in range(k):
+        t=i/(k-1) if k>1 else 0.0
+        x=int(round(math.exp(L0 + t*(L1-L0))))
+        x=max(xmin, min(x,xmax))
+        if x not in first: first[x]=(i, L0 + t*(L1-L0))
+    try:
+        return [first[int(x)] for x in xs]
+    except KeyError:
+        raise SystemExit("--engine recurrence requiere los x de make_x_points(xmax, points, xmin)")
+
+# Error de la recurrencia (u = 2^-53): el fasor e^{i g G_i} se avanza con
+# rot = e^{i g h}, que lleva un error de fase <= u*(g*h+2) y de modulo <= 2u por
+# paso; tras R pasos (R = anchor) el error es <= R*u*(g*h+4), y cada R filas se
+# re-ancla con cos/sin directos. La correccion por redondeo de x a entero,
+# e^{i g d_i} con d_i = log(x_i) - G_i (|d_i| <= 0.5/x_i), se evalua por Taylor
+# en g*d_i/2^s (|.| <= 1/4, resto < 2^-s*1e-17) y s duplicaciones de angulo.
+# Filas con max|g*d_i| > CORR_MAX (x pequenos) se evaluan directas.
+ANCHOR = 64
+CORR_MAX = 2.0
+
+def _cos_sin_taylor(th):
+    # cos/sin de |th| <= CORR_MAX sin transcendentes: Taylor + duplicacion de angulo
+    m = float(np.abs(th).max()) if th.size else 0.0
+    s = max(0, math.ceil(math.log2(m/0.25))) if m > 0.25 else 0
+    r = th/(1 << s) if s else th
+    rm = m/(1 << s)
+    n = 1
+    while rm**(n+1)/math.factorial(n+1) > 1e-17/(1 << s): n += 1
+    t = r*r
+    nc = n//2; ns = (n-1)//2
+    c = np.full_like(r, (-1)**nc/math.factorial(2*nc))
+    for q in range(nc-1, -1, -1):
+        c = c*t + (-1)**q/math.factorial(2*q)
+    sn = np.full_like(r, (-1)**ns/math.factorial(2*ns+1))
+    for q in range(ns-1, -1, -1):
+        sn = sn*t + (-1)**q/math.factorial(2*q+1)
+    sn = sn*r
+    for _ in range(s):
+        c, sn = c*c - sn*sn, 2.0*c*sn
+    return c, sn
+
+def explicit_sums_recurrence(xs, gammas, ks, grid, h, anchor=ANCHOR, zblock=ZBLOCK, coeffs=None):
+    # Misma S que explicit_sums para x de una rejilla log-uniforme; grid = [(i, G_i)]
+    xs = list(xs)
+    ks = np.asarray(ks, dtype=np.int64)
+    g, a, b = zero_coeffs(gammas) if coeffs is None else coeffs
+    d = [math.log(x) - G for x, (i, G) in zip(xs, grid)]
+    out = np.zeros(len(xs))
+    kmax = int(ks.max()) if len(xs) else 0
+    for j0 in range(0, kmax, zblock):
+        j1 = min(j0+zblock, kmax)
+        gb, ab, bb = g[j0:j1], a[j0:j1], b[j0:j1]
+        rc, rs = np.cos(gb*h), np.sin(gb*h)
+        zc = zs = None; prev = None; since = 0
+        for r, (x, (i, G)) in enumerate(zip(xs, grid)):
+            if zc is None or i != prev+1 or since >= anchor:
+                ph = gb*G
+                zc, zs = np.cos(ph), np.sin(ph); since = 0
+            else:
+                zc, zs = zc*rc - zs*rs, zc*rs + zs*rc; since += 1
+            prev = i
+            k = int(ks[r])
+            if k <= j0: continue
+            n = min(k, j1) - j0
+            th = gb[:n]*d[r]
+            if abs(d[r])*gb[n-1] > CORR_MAX:
+                ph = gb[:n]*math.log(x)
+                C, S = np.cos(ph), np.sin(ph)
+            else:
+                cc, cs = _cos_sin_taylor(th)
+                C = zc[:n]*cc - zs[:n]*cs
+                S = zs[:n]*cc + zc[:n]*cs
+            out[r] += float(np.dot(ab[:n], C) + np.dot(bb[:n], S))
+    for r, x in enumerate(xs):
+        out[r] *= 2.0*math.sqrt(x)
+    return out
+
+# ---- NUFFT tipo 3: F(L) = sum_j c_j e^{i g_j L}, c_j = a_j - i*b_j, S = 2*sqrt(x)*Re F ----
+# Se centra g' = g - gc, L' = L - Lc: F(L) = e^{i gc L} * sum_j c'_j e^{i g'_j L'} con
+# c'_j = c_j e^{i g'_j Lc}. (1) tipo 1 por gaussianas (Greengard-Lee, R=2) sobre la
+# rejilla uniforme L'_m = m*hL, hL = pi/(SIGMA*G); (2) interpolacion sinc con
+# regularizacion gaussiana hasta cada L' (la suma es de banda limitada a |g'|<=G).
+# Coste O(#ceros*Msp + M log M + #x*W); tol es el error relativo a sum_j |c_j|.
+NUFFT_TOL = 1e-10
+NUFFT_SIGMA = 4.0
+NUFFT_MIN_X = 64   # grupos de corte con menos x van por el camino directo
+
+def _nufft_params(tol):
+    d = max(1.0, -math.log10(tol))
+    msp = int(math.ceil(d)) + 2
+    w = int(math.ceil(-math.log(tol)/(0.5*math.pi*(1.0 - 1.0/NUFFT_SIGMA)))) + 2
+    return msp, w
+
+def nufft_type3(gs, cs, Ls, tol=NUFFT_TOL):
+    # F(L) = sum_j cs_j e^{i gs_j L} para L arbitrarios
+    gs = np.asarray(gs, dtype=np.float64); Ls = np.asarray(Ls, dtype=np.float64)
+    cs = np.asarray(cs, dtype=np.complex128)
+    msp, w = _nufft_params(tol)
+    gc = 0.5*(gs.min() + gs.max()); Lc = 0.5*(Ls.min() + Ls.max())
+    gp = gs - gc; Lp = Ls - Lc
+    G = max(float(np.abs(gp).max()), 1.0)
+    cp = cs*np.exp(1j*gp*Lc)
+    hL = math.pi/(NUFFT_SIGMA*G)
+    half = int(math.ceil(float(np.abs(Lp).max())/hL)) + w + 1
+    M = 2*half
+    # (1) F(m*hL), m in [-half, half): sum_j cp_j e^{i m th_j}, th_j = g'_j*hL en [-pi/SIGMA, pi/SIGMA]
+    R = 2; Mr = R*M
+    tau = math.pi*msp/(M*M*R*(R - 0.5))
+    th = -gp*hL   # signo invertido: el coeficiente m de la convolucion da e^{+i m th}
+    l0 = np.rint(th*Mr/(2.0*math.pi)).astype(np.int64)
+    off = np.arange(-msp, msp+1)
+    ll = l0[:, None] + off[None, :]
+    wgt = np.exp(-(2.0*math.pi*ll/Mr - th[:, None])**2/(4.0*tau))
+    idx = (ll % Mr).ravel()
+    vals = (cp[:, None]*wgt).ravel()
+    hgrid = np.bincount(idx, weights=vals.real, minlength=Mr) + 1j*np.bincount(idx, weights=vals.imag, minlength=Mr)
+    H = np.fft.fft(hgrid)/Mr
+    m = np.arange(-half, half)
+    Fm = math.sqrt(math.pi/tau)*np.exp(m*m*tau)*H[m % Mr]
+    # (2) interpolacion: F(L') ~ sum_m F(m hL) sinc(t-m) e^{-(t-m)^2/(2 r^2)}, t = L'/hL
+    r2 = w/(math.pi*(1.0 - 1.0/NUFFT_SIGMA))
+    t = Lp/hL
+    m0 = np.floor(t).astype(np.int64)
+    mm = m0[:, None] + np.arange(-w+1, w+1)[None, :]
+    u = t[:, None] - mm
+    ker = np.sinc(u)*np.exp(-u*u/(2.0*r2))
+    F = (Fm[mm + half]*ker).sum(axis=1)
+    return F*np.exp(1j*gc*Ls)
+
+def explicit_sums_nufft(xs, gammas, ks, tol=NUFFT_TOL, xblock=XBLOCK, zblock=ZBLOCK, coeffs=None):
+    # Misma S que explicit_sums; un NUFFT por cada corte k distinto (grupos grandes)
+    xs = list(xs)
+    ks = np.asarray(ks, dtype=np.int64)
+    g, a, b = zero_coeffs(gammas) if coeffs is None else coeffs
+    c = a - 1j*b
+    L = np.array([math.log(x) for x in xs], dtype=np.float64)
+    sq = np.array([math.sqrt(x) for x in xs], dtype=np.float64)
+    out = np.zeros(len(xs))
+    small = []
+    for k in np.unique(ks):
+        sel = np.nonzero(ks == k)[0]
+        if k == 0: continue
+        if sel.size < NUFFT_MIN_X:
+            small.extend(sel.tolist()); continue
+        F = nufft_type3(g[:k], c[:k], L[sel], tol)
+        out[sel] = 2.0*sq[sel]*F.real
+    if small:
+        small.sort()
+        out[small] = explicit_sums([xs[i] for i in small], gammas, ks[small], xblock, zblock, (g, a, b))
+    return out
+
+def psi_explicit_nufft(xs, gammas, Ts, tol=NUFFT_TOL, check=False):
+    ks = cutoff_index(gammas, Ts)
+    S = explicit_sums_nufft(xs, gammas, ks, tol)
+    if check:
+        # error frente a la suma directa, en unidades de 2*sqrt(x)*sum_{j<k}|c_j|
+        g, a, b = zero_coeffs(gammas)
+        D = explicit_sums(xs, gammas, ks, coeffs=(g, a, b))
+        cabs = np.concatenate(([0.0], np.cumsum(np.hypot(a, b))))
+        scale = np.array([2.0*math.sqrt(x) for x in xs])*cabs[ks]
+        err = float(np.max(np.abs(S - D)/np.maximum(scale, 1e-300))) if len(xs) else 0.0
+        print(f"[check] nufft vs directo: max err/sum|c| = {err:.3e} (tol {tol:.1e})")
+    return [x - float(v) - (math.log(2.0*math.pi) + 0.5*math.log(1.0 - x**-2)) for x, v in zip(xs, S)]
+
+# ---- Fase en doble-doble para x grandes ----
+# Con x >= 1e12 y g ~ 1e5 la fase g*log x ~ 1e6 rad pierde ~6 digitos en float64.
+# g = g_hi + g_lo (del texto del fichero via Decimal) y log x = L_hi + L_lo (Decimal);
+# el producto g_hi*L_hi se forma exacto (Dekker), se reduce mod 2*pi con una
+# descomposicion Cody-Waite de 2*pi en tres partes (n*C1 y n*C2 exactos para
+# |n| < 2^25) y cos/sin(r_hi + r_lo) = cos r_hi - r_lo sin r_hi (+ O(r_lo^2)).
+TWO_PI_STR = "6.28318530717958647692528676655900576839433879875021164194988918"
+_DEKKER = 134217729.0   # 2^27 + 1
+DD_NMAX = 1 << 25
+
+def _split_bits(d, bits):
+    from decimal import Decimal
+    m, e = math.frexp(float(d))
+    hi = math.ldexp(math.floor(math.ldexp(m, bits)), e - bits)
+    return hi, d - Decimal(hi)
+
+def _two_pi_parts():
+    from decimal import Decimal, getcontext
+    getcontext().prec = 60
+    c1, r = _split_bits(Decimal(TWO_PI_STR), 28)
+    c2, r = _split_bits(r, 28)
+    return c1, c2, float(r)
+
+C1, C2, C3 = _two_pi_parts()
+
+def dd_split(strings):
+    # (hi, lo) float64 con hi + lo = valor decimal del texto (coma decimal admitida)
+    from decimal import Decimal, getcontext
+    getcontext().prec = 60
+    hi, lo = [], []
+    for s in strings:
+        d = Decimal(s.strip().replace(",", "."))
+        h = float(d); hi.append(h); lo.append(float(d - Decimal(h)))
+    return np.array(hi), np.array(lo)
+
+def read_gammas_dd(path):
+    # mismo fichero y orden que read_gammas, pero con la parte baja de cada gamma
+    zs = zero_store.open_sidecar(path, need=("lo",))
+    if zs is not None:
+        return np.array(zs.g), np.array(zs.lo)
+    with open(path, "r", encoding="utf-8-sig") as f:
+        txt = [s.strip() for s in f if s.strip()]
+    hi, lo = dd_split(txt)
+    o = np.argsort(hi, kind="stable")
+    return hi[o], lo[o]
+
+def log_dd(x):
+    from decimal import Decimal, getcontext
+    getcontext().prec = 60
+    d = Decimal(int(x)).ln()
+    h = float(d)
+    return h, float(d - Decimal(h))
+
+def _two_prod(a, b):
+    # a*b = p + e exacto (Dekker, sin FMA)
+    p = a*b
+    t = _DEKKER*a; ah = t - (t - a); al = a - ah
+    t = _DEKKER*b; bh = t - (t - b); bl = b - bh
+    e = ((ah*bh - p) + ah*bl + al*bh) + al*bl
+    return p, e
+
+def explicit_sums_dd(xs, ghi, glo, ks, xblock=XBLOCK, zblock=ZBLOCK):
+    # Misma S que explicit_sums con la fase g*log x reducida en doble-doble
+    xs = list(xs)
+    ks = np.asarray(ks, dtype=np.int64)
+    g, a, b = zero_coeffs(ghi)
+    LL = [log_dd(x) for x in xs]
+    Lh = np.array([l[0] for l in LL]); Ll = np.array([l[1] for l in LL])
+    sq = np.array([math.sqrt(x) for x in xs], dtype=np.float64)
+    kall = int(ks.max()) if len(xs) else 0
+    if kall and float(Lh.max())*g[kall-1] >= DD_NMAX*C1:
+        raise SystemExit("--engine dd: fase fuera del rango de la reduccion (|g*log x| < 2^25*2*pi)")
+    out = np.zeros(len(xs))
+    for i0 in range(0, len(xs), xblock):
+        i1 = min(i0+xblock, len(xs))
+        Lhb, Llb = Lh[i0:i1, None], Ll[i0:i1, None]
+        kb = ks[i0:i1]
+        kmin, kmax = int(kb.min()), int(kb.max())
+        acc = np.zeros(i1-i0)
+        for j0 in range(0, kmax, zblock):
+            j1 = min(j0+zblock, kmax)
+            gh, gl = g[j0:j1], glo[j0:j1]
+            p, e = _two_prod(Lhb, gh)
+            e = e + (Lhb*gl + Llb*gh)
+            n = np.rint(p*(1.0/C1))
+            t = p - n*C1                       # exacto (n*C1 exacto, Sterbenz)
+            u = -n*C2
+            rh = t + u                         # two_sum(t, u)
+            bv = rh - t
+            rl = ((t - (rh - bv)) + (u - bv)) - n*C3 + e
+            c, s = np.cos(rh), np.sin(rh)
+            t = a[j0:j1]*(c - rl*s) + b[j0:j1]*(s + rl*c)
+            if j1 > kmin:
+                t[np.arange(j0, j1)[None, :] >= kb[:, None]] = 0.0
+            acc += t.sum(axis=1)
+        out[i0:i1] = 2.0*sq[i0:i1]*acc
+    return out
+
+def psi_explicit_dd(xs, gammas, Ts, args):
+    ghi, glo = read_gammas_dd(args.zeros)
+    if ghi.size != len(gammas) or not np.array_equal(ghi, np.asarray(gammas, dtype=np.float64)):
+        raise SystemExit("--engine dd: los ceros de --zeros no coinciden con los leidos")
+    S = explicit_sums_dd(xs, ghi, glo, cutoff_index(gammas, Ts), args.xblock, args.zblock)
+    return [x - float(v) - (math.log(2.0*math.pi) + 0.5*math.log(1.0 - x**-2)) for x, v in zip(xs, S)]
+
+def psi_explicit_block(xs, gammas, Ts, xblock=XBLOCK, zblock=ZBLOCK, coeffs=None):
+    # psi_explicit_truncated(x, gammas, T) para todos los x a la vez
+    S = explicit_sums(xs, gammas, cutoff_index(gammas, Ts), xblock, zblock, coeffs)
+    out = []
+    for x, s in zip(xs, S):
+        tail = math.log(2.0*math.pi) + 0.5*math.log(1.0 - x**-2)
+        out.append(x - float(s) - tail)
+    return out
+
+# ---- Pool de procesos: ceros publicados una vez en un .npy mapeado en memoria ----
+_ZEROS = None
+
+def _init_pool_worker(path):
+    # (g, a, b) de solo lectura; las paginas las comparte la cache del SO
+    global _ZEROS
+    _ZEROS = np.load(path, mmap_mode="r")
+
+def _pool_task(task):
+    engine, xs, Ts, xblock, zblock, scalar_fn = task
+    g, a, b = _ZEROS[0], _ZEROS[1], _ZEROS[2]
+    if engine == "scalar":
+        gl = g.tolist()
+        return [scalar_fn(x, gl, T) for x, T in zip(xs, Ts)]
+    return psi_explicit_block(xs, g, Ts, xblock, zblock, coeffs=(g, a, b))
+
+def psi_explicit_pool(xs, gammas, Ts, workers, engine="numpy", xblock=XBLOCK, zblock=ZBLOCK,
+                      scalar_fn=None, chunk=None):
+    # Reparte los x en trozos contiguos; imap devuelve en orden de x, y cada x se
+    # calcula con el mismo codigo que en serie, asi que el CSV es identico.
+    import multiprocessing as mpc, os, tempfile
+    xs = list(xs); Ts = list(Ts)
+    if chunk is None:
+        chunk = max(xblock, -(-len(xs)//(workers*4)))
+    fd, path = tempfile.mkstemp(suffix=".npy", prefix="zeros_")
+    os.close(fd)
+    try:
+        np.save(path, np.stack(zero_coeffs(gammas)))
+        tasks = [(engine, xs[i:i+chunk], Ts[i:i+chunk], xblock, zblock, scalar_fn)
+                 for i in range(0, len(xs), chunk)]
+        out = []
+        with mpc.Pool(processes=workers, initializer=_init_pool_worker, initargs=(path,)) as pool:
+            for part in pool.imap(_pool_task, tasks):
+                out.extend(part)
+        return out
+    finally:
+        os.remove(path)
+
+def psi_explicit_recurrence(xs, gammas, Ts, args):
+    grid = grid_indices(xs, args.xmax, args.points, args.xmin)
+    xmin = max(2, int(args.xmin))
+    h = (math.log(float(args.xmax)) - math.log(float(xmin)))/(args.points-1) if args.points > 1 else 0.0
+    S = explicit_sums_recurrence(xs, gammas, cutoff_index(gammas, Ts), grid, h, args.anchor, args.zblock)
+    return [x - float(v) - (math.log(2.0*math.pi) + 0.5*math.log(1.0 - x**-2)) for x, v in zip(xs, S)]
+
+# ---- Cola analitica: ceros por encima de T con la densidad de Riemann-von Mangoldt ----
+# sum_{g>T} 2 Re(x^rho/rho) ~ 2 sqrt(x) Re int_{T*}^inf f(t) e^{itL} dt,
+#   f(t) = log(t/2pi) / (2pi (1/2 + it)),   N'(t) = log(t/2pi)/(2pi)
+# Dos pasos de integracion por partes: e^{iLA} (-f(A)/(iL) + f'(A)/(iL)^2), con
+# A = T* = punto medio entre el ultimo cero usado y el siguiente (S(T*) ~ 0).
+# Resto de la expansion <= 2 sqrt(x) (2 + log(A/2pi)) / (2pi A^2 L^2). La fluctuacion
+# S(t) del conteo de ceros no entra en la cota.
+
+def tail_density(x, gammas, T):
+    # (cola estimada, cota del resto de la expansion; sin S(t), no es el error de la cola)
+    import bisect
+    k = bisect.bisect_right(gammas, T)
+    if k == 0:
+        return 0.0, math.inf
+    if k < len(gammas):
+        A = 0.5*(gammas[k-1] + gammas[k])
+    else:
+        A = gammas[-1] + math.pi/math.log(gammas[-1]/(2.0*math.pi))
+    L = math.log(x)
+    lg = math.log(A/(2.0*math.pi))
+    rho = complex(0.5, A)
+    f = lg/(2.0*math.pi*rho)
+    fp = (rho/A - 1j*lg)/(2.0*math.pi*rho*rho)
+    iL = 1j*L
+    I = complex(math.cos(A*L), math.sin(A*L))*(-f/iL + fp/(iL*iL))
+    sq2 = 2.0*math.sqrt(x)
+    return sq2*I.real, sq2*(2.0 + lg)/(2.0*math.pi*A*A*L*L)
+
+# ---- Modo certificado: cotas a priori del redondeo en float64 ----
+# Encierra psi(x) - sum_{g<=T}(...) exacto para los ceros del fichero tomados como
+# datos (su incertidumbre es otro asunto). Con u = 2^-53:
+#  psi:     n sumas sucesivas de log(n) con error <= 1 ulp -> <= gamma_{x+3} * psi
+#  fase:    fl(fl(g)*fl(log x)) -> |dphi| <= 5u*g*L
+#  cos/sin: <= TRIG_ULP ulps de 1 (math y los bucles SIMD de numpy). SUPUESTO, no
+#           verificado: ni libm ni numpy garantizan una cota; glibc y los bucles SIMD
+#           de numpy documentan <= 4 ulp. Con otra libm la cota puede no valer.
+#  termino: coeficientes y productos, <= 8u*(|a|+|b|)
+#  suma:    cualquier orden (escalar, teselas, pool): <= gamma_k * sum|t_j|
+# y las operaciones finales (x - S - cola, psi - explicito, sqrt(x)*log(x)^2).
+# |S| se reconstruye como x - px - cola mas el error de esas dos restas. La cola
+# lleva 8u*(|cola| + 1): el + 1 cubre el redondeo del argumento 1 - x^-2, que tras
+# el log es un error absoluto ~u aunque la cola valga ~log(2 pi).
+# --check recalcula el resto con mpmath en unos pocos x y comprueba el encierro.
+U = 2.0**-53
+TRIG_ULP = 4
+CERT_ENGINES = ("scalar", "numpy")
+
+def _gamma_n(n):
+    return n*U/(1.0 - n*U)
+
+def certified_bounds(xs, gammas, Ts, pes, pxs):
+    # [(rem_lo, rem_hi, ratio_lo, ratio_hi)] por x; aritmetica math pura (sin numpy)
+    import bisect
+    A1 = [0.0]; Ag = [0.0]
+    for g in gammas:
+        den = 0.25 + g*g
+        t = (0.5 + g)/den
+        A1.append(A1[-1] + t); Ag.append(Ag[-1] + g*t)
+    infl = 1.0 + _gamma_n(len(gammas) + 64)   # sumas de prefijo y evaluacion de la cota
+    out = []
+    for x, T, pe, px in zip(xs, Ts, pes, pxs):
+        k = bisect.bisect_right(gammas, T)
+        L = math.log(x); sq = math.sqrt(x)
+        tail = math.log(2.0*math.pi) + 0.5*math.log(1.0 - x**-2)
+        absS = abs(x - px - tail) + 2.0*U*(x + abs(px) + abs(tail))
+        eS = 2.0*sq*(5.0*U*L*Ag[k] + (2.0*TRIG_ULP + 8.0)*U*A1[k] + _gamma_n(k + 1)*A1[k]) + 4.0*U*absS
+        epx = eS + 8.0*U*(abs(tail) + 1.0) + 2.0*U*(x + absS + abs(tail))
+        ep = _gamma_n(x + 3)*abs(pe)
+        rem = pe - px
+        E = (ep + epx + U*abs(rem))*infl*infl
+        lo = math.nextafter(rem - E, -math.inf); hi = math.nextafter(rem + E, math.inf)
+        D = sq*(L**2)
+        Dlo = math.nextafter(D*(1.0 - 8.0*U), 0.0); Dhi = math.nextafter(D*(1.0 + 8.0*U), math.inf)
+        amin = 0.0 if lo <= 0.0 <= hi else min(abs(lo), abs(hi))
+        out.append((lo, hi, math.nextafter(amin/Dhi, 0.0), math.nextafter(max(abs(lo), abs(hi))/Dlo, math.inf)))
+    return out
+
+def certified_columns(args, xs, gammas, Ts, psi, pxs):
+    # sufijos ',rem_lo,rem_hi,ratio_lo,ratio_hi' (repr: el float exacto, sin redondeo al imprimir)
+    if not getattr(args, "certified", False):
+        return None
+    if args.engine not in CERT_ENGINES:
+        raise SystemExit(f"--certified solo con --engine {'/'.join(CERT_ENGINES)}")
+    if getattr(args, "psi", "auto") == "sublinear":
+        raise SystemExit("--certified no admite --psi sublinear (sin cota a priori)")
+    bounds = certified_bounds(xs, gammas, Ts, [psi[x] for x in xs], pxs)
+    if getattr(args, "check", False):
+        check_certified(xs, gammas, Ts, bounds)
+    return [f",{lo!r},{hi!r},{rlo!r},{rhi!r}" for lo, hi, rlo, rhi in bounds]
+
+CERT_HEADER = f",rem_lo (redondeo float64; supone cos/sin <= {TRIG_ULP} ulp),rem_hi,ratio_lo,ratio_hi"
+CHECK_POINTS = 3
+
+def check_certified(xs, gammas, Ts, bounds, npts=CHECK_POINTS, dps=40):
+    # psi(x) - (x - S_T - cola) con mpmath en npts x repartidos; SystemExit si alguno
+    # cae fuera de [rem_lo, rem_hi]. psi exacto: sum log p sobre potencias de primos.
+    try:
+        import mpmath as mp
+    except ImportError:
+        print("[check] --certified: sin mpmath, no se verifica el encierro")
+        return
+    import bisect
+    mp.mp.dps = dps
+    idx = sorted({round(i*(len(xs) - 1)/max(1, npts - 1)) for i in range(npts)}) if xs else []
+    n = max((int(xs[i]) for i in idx), default=1)
+    sv = bytearray([1])*(n + 1); sv[:2] = b"\0\0"   # criba sin numpy (tambien en npyfree)
+    for p in range(2, math.isqrt(n) + 1):
+        if sv[p]: sv[p*p::p] = bytes(len(range(p*p, n + 1, p)))
+    primes = [p for p in range(n + 1) if sv[p]]
+    slack = 0.5
+    for i in idx:
+        x, T = int(xs[i]), Ts[i]
+        pe = mp.mpf(0)
+        for p in primes[:bisect.bisect_right(primes, x)]:
+            e = int(math.log(x)/math.log(p)) + 1
+            while p**e > x: e -= 1
+            pe += e*mp.log(p)
+        L, sq = mp.log(x), mp.sqrt(x)
+        S = mp.fsum(2*sq*(mp.cos(g*L)/2 + g*mp.sin(g*L))/(mp.mpf(1)/4 + g*g)
+                    for g in (mp.mpf(v) for v in gammas[:bisect.bisect_right(gammas, T)]))
+        rem = pe - (x - S - mp.log(2*mp.pi) - mp.log(1 - mp.mpf(x)**-2)/2)
+        lo, hi = bounds[i][0], bounds[i][1]
+        if not (lo <= rem <= hi):
+            raise SystemExit(f"[check] --certified: x={x} resto {mp.nstr(rem, 20)} fuera de [{lo!r}, {hi!r}]")
+        slack = min(slack, float(min(rem - lo, hi - rem)/(hi - lo)))
+    print(f"[check] --certified: encierro verificado con mpmath en {len(idx)} x "
+          f"(holgura minima {slack:.3f} del ancho; 0.5 = centrado)")
+
+def add_engine_args(ap):
+    ap.add_argument("--engine", choices=["scalar","numpy","recurrence","nufft","dd","auto"], default="scalar",
+                    help="scalar: bucle puro math; numpy: teselas x*ceros vectorizadas; "
+                         "recurrence: rotacion de fasores sobre la rejilla log-uniforme de make_x_points; "
+                         "nufft: transformada no uniforme tipo 3 con FFT, O((#x+#ceros) log); "
+                         "dd: fase g*log x en doble-doble (x >= 1e12); "
+                         "auto: el mas barato segun el modelo de coste de engine_plan.py")
+    ap.add_argument("--plan", action="store_true",
+                    help="imprime tiempo y memoria estimados de cada engine y modo psi, y termina sin calcular")
+    ap.add_argument("--calibration", default=None,
+                    help="constantes del modelo de coste (por defecto engine_calibration.json; "
+                         "python engine_plan.py --calibrate)")
+    ap.add_argument("--nufft_tol", type=float, default=NUFFT_TOL,
+                    help="error relativo a sum|c_j| del engine nufft")
+    ap.add_argument("--anchor", type=int, default=ANCHOR, help="filas entre re-anclajes directos (engine recurrence)")
+    ap.add_argument("--xblock", type=int, default=XBLOCK, help="filas x por tesela (engine numpy)")
+    ap.add_argument("--zblock", type=int, default=ZBLOCK, help="ceros por tesela (engine numpy)")
+    ap.add_argument("--xworkers", type=int, default=1,
+                    help="procesos para las sumas por x (ceros compartidos via .npy mapeado)")
+    ap.add_argument("--check", action="store_true",
+                    help="recalcula con el camino escalar e informa la desviacion relativa maxima")
+    ap.add_argument("--certified", action="store_true",
+                    help="anade al CSV cotas del error de redondeo float64 del resto y del ratio; "
+                         f"supone cos/sin con error <= {TRIG_ULP} ulp (glibc/numpy, no verificado). "
+                         "Con --check se comprueba el encierro contra mpmath en unos pocos x")
+
+def scalar_list(gammas):
+    # los bucles escalares van mas rapido sobre floats de Python que sobre np.float64
+    return gammas.tolist() if hasattr(gammas, "tolist") else gammas
+
+def explicit_values(xs, gammas, Ts, args, scalar_fn):
+    # Valores psi_explicit para cada (x,T) con el engine elegido en args
+    if args.engine == "auto" or getattr(args, "plan", False) or getattr(args, "mem_budget", None):
+        import engine_plan
+        engine_plan.apply_mem_budget(args)
+        if args.engine == "auto" or getattr(args, "plan", False):
+            engine_plan.pick_engine(xs, gammas, Ts, args)
+            engine_plan.apply_mem_budget(args)   # teselas del engine elegido
+    if args.engine != "scalar" and np is None:
+        raise SystemExit(f"--engine {args.engine} requiere numpy")
+    if getattr(args, "certified", False) and args.engine not in CERT_ENGINES:
+        raise SystemExit(f"--certified solo con --engine {'/'.join(CERT_ENGINES)}")
+    if args.engine == "recurrence":
+        # la recurrencia encadena filas consecutivas: se evalua en un solo proceso
+        pxs = psi_explicit_recurrence(xs, gammas, Ts, args)
+    elif args.engine == "dd":
+        pxs = psi_explicit_dd(xs, gammas, Ts, args)
+    elif args.engine == "nufft":
+        pxs = psi_explicit_nufft(xs, gammas, Ts, args.nufft_tol, args.check)
+    elif args.xworkers > 1:
+        if np is None: raise SystemExit("--xworkers requiere numpy")
+        pxs = psi_explicit_pool(xs, gammas, Ts, args.xworkers, args.engine, args.xblock, args.zblock, scalar_fn)
+    elif args.engine == "scalar":
+        gl = scalar_list(gammas)
+        pxs = [scalar_fn(x, gl, T) for x, T in zip(xs, Ts)]
+    else:
+        pxs = psi_explicit_block(xs, gammas, Ts, args.xblock, args.zblock)
+    if args.check and args.engine != "scalar":
+        gl = scalar_list(gammas)
+        ref = [scalar_fn(x, gl, T) for x, T in zip(xs, Ts)]
+        dev = max((abs(p-r)/max(abs(r), 1e-300) for p, r in zip(pxs, ref)), default=0.0)
+        print(f"[check] engine={args.engine} vs scalar: max rel dev = {dev:.3e}")
+    return pxs
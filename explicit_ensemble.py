@@ -0,0 +1,131 @@
+# explicit_ensemble.py
+# Sensibilidad de psi_explicit a la precision de los ceros del fichero.
+# Cada gamma_j tiene semiancho h_j = 0.5*10^-d_j segun sus decimales en el texto
+# (las colas ...0001 / ...9999 de floats reimpresos no cuentan como digitos).
+# K copias perturbadas gamma_j + h_j*e_jk, e uniforme en [-1,1], con el corte k_x fijo:
+#   linear: dpsi_k(x) = -sum_j d_j(x) h_j e_jk,  d_j = 2 sqrt(x) Re(i e^{igL}(L/rho - 1/rho^2))
+#           (una pasada de derivadas y un producto matricial por las K copias)
+#   batch:  suma explicita completa de las K copias en teselas 3-D (x, cero, copia)
+# Cota determinista: |dpsi| <= sum_j |d_j| h_j + 1/2 sum_j M2_j h_j^2,
+#   M2_j = 2 sqrt(x) (L^2/|rho| + 2L/|rho|^2 + 2/|rho|^3)  (|rho| en gamma_j - h_j).
+
+import math, re
+import numpy as np
+import explicit_engine as ee
+
+_ARTIFACT = re.compile(r"(0{3,}|9{3,})\d{0,2}$")
+REPR_DIGITS = 12   # fracciones de 12+ digitos: float reimpreso, se busca la cola espuria
+
+def zero_halfwidths(path):
+    # h_j en el mismo orden que read_gammas (orden por valor, estable)
+    vals, hs = [], []
+    with open(path, "r", encoding="utf-8-sig") as f:
+        for s in f:
+            s = s.strip().replace(",", ".")
+            if not s: continue
+            vals.append(float(s))
+            frac = s.split(".", 1)[1] if "." in s else ""
+            frac = frac.split("e")[0].split("E")[0]
+            m = _ARTIFACT.search(frac) if len(frac) >= REPR_DIGITS else None
+            d = m.start() if m else len(frac)
+            hs.append(0.5*10.0**-d)
+    o = np.argsort(np.array(vals), kind="stable")
+    return np.array(hs)[o]
+
+def _deriv_tile(Lb, sqb, g, rho_inv):
+    # d_j(x) = 2 sqrt(x) Re(i e^{igL} (L/rho - 1/rho^2))
+    ph = Lb*g
+    w = 1j*np.exp(1j*ph)*(Lb*rho_inv - rho_inv*rho_inv)
+    return 2.0*sqb*w.real
+
+def ensemble_linear(xs, gammas, ks, h, E, xblock=ee.XBLOCK, zblock=ee.ZBLOCK):
+    # (dpsi [nx, K], sum|d|h [nx]) por derivadas, teselas como explicit_sums
+    xs = list(xs)
+    g = np.asarray(gammas, dtype=np.float64)
+    ks = np.asarray(ks, dtype=np.int64)
+    rho_inv = 1.0/(0.5 + 1j*g)
+    L = np.array([math.log(x) for x in xs]); sq = np.array([math.sqrt(x) for x in xs])
+    hE = h[:, None]*E
+    dpsi = np.zeros((len(xs), E.shape[1])); wc1 = np.zeros(len(xs))
+    for i0 in range(0, len(xs), xblock):
+        i1 = min(i0+xblock, len(xs))
+        kb = ks[i0:i1]; kmax = int(kb.max())
+        for j0 in range(0, kmax, zblock):
+            j1 = min(j0+zblock, kmax)
+            d = _deriv_tile(L[i0:i1, None], sq[i0:i1, None], g[j0:j1], rho_inv[j0:j1])
+            d[np.arange(j0, j1)[None, :] >= kb[:, None]] = 0.0
+            dpsi[i0:i1] -= d @ hE[j0:j1]
+            wc1[i0:i1] += np.abs(d) @ h[j0:j1]
+    return dpsi, wc1
+
+def ensemble_batch(xs, gammas, ks, h, E, xblock=ee.XBLOCK, zblock=ee.ZBLOCK):
+    # dpsi [nx, K]: sumas completas de las K copias menos la nominal
+    xs = list(xs)
+    g = np.asarray(gammas, dtype=np.float64)
+    ks = np.asarray(ks, dtype=np.int64)
+    K = E.shape[1]
+    zb = max(64, zblock//K)
+    L = np.array([math.log(x) for x in xs]); sq = np.array([math.sqrt(x) for x in xs])
+    out = np.zeros((len(xs), K))
+    for i0 in range(0, len(xs), xblock):
+        i1 = min(i0+xblock, len(xs))
+        kb = ks[i0:i1]; kmax = int(kb.max())
+        Lb = L[i0:i1, None, None]
+        for j0 in range(0, kmax, zb):
+            j1 = min(j0+zb, kmax)
+            g0 = g[j0:j1, None]
+            gk = np.concatenate((g0, g0 + h[j0:j1, None]*E[j0:j1]), axis=1)   # copia 0 = nominal
+            den = 0.25 + gk*gk
+            ph = Lb*gk[None]
+            t = (0.5*np.cos(ph) + gk*np.sin(ph))/den
+            t[np.arange(j0, j1)[None, :] >= kb[:, None]] = 0.0
+            acc = t.sum(axis=1)
+            out[i0:i1] -= 2.0*sq[i0:i1, None]*(acc[:, 1:] - acc[:, :1])
+    return out
+
+def second_order_bound(xs, gammas, ks, h):
+    # 1/2 sum_{j<k} M2_j h_j^2 por x (prefijos)
+    g = np.asarray(gammas, dtype=np.float64)
+    r = np.sqrt(0.25 + np.maximum(g - h, 0.0)**2)
+    out = []
+    for x, k in zip(xs, ks):
+        L = math.log(x); k = int(k)
+        m2 = L*L/r[:k] + 2.0*L/r[:k]**2 + 2.0/r[:k]**3
+        out.append(0.5*2.0*math.sqrt(x)*float(np.dot(m2, h[:k]**2)))
+    return np.array(out)
+
+def add_ensemble_args(ap):
+    ap.add_argument("--ensemble", type=int, default=0, help="K copias perturbadas de los ceros (0 = desactivado)")
+    ap.add_argument("--ensemble_mode", choices=["linear", "batch"], default="linear")
+    ap.add_argument("--ensemble_seed", type=int, default=1)
+    ap.add_argument("--ensemble_h", type=float, default=None,
+                    help="semiancho comun para todos los ceros (por defecto: decimales del fichero)")
+
+def run_ensemble(args, gammas, xs, Ts, pxs, psi):
+    # <out>_ensemble.csv: dispersion por x en las K copias y cota de peor caso
+    K = args.ensemble
+    h = zero_halfwidths(args.zeros) if args.ensemble_h is None else np.full(len(gammas), args.ensemble_h)
+    rng = np.random.default_rng(args.ensemble_seed)
+    E = rng.uniform(-1.0, 1.0, size=(len(gammas), K))
+    ks = ee.cutoff_index(gammas, Ts)
+    if args.ensemble_mode == "linear":
+        dpsi, wc1 = ensemble_linear(xs, gammas, ks, h, E, args.xblock, args.zblock)
+    else:
+        dpsi = ensemble_batch(xs, gammas, ks, h, E, args.xblock, args.zblock)
+        wc1 = ensemble_linear(xs, gammas, ks, h, E[:, :0], args.xblock, args.zblock)[1]
+    wc = wc1 + second_order_bound(xs, gammas, ks, h)
+    path = args.out.rsplit(".", 1)[0] + "_ensemble.csv"
+    worst = 0.0; spread = 0.0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("x,T_used,ratio,dpsi_std,dpsi_min,dpsi_max,ratio_min,ratio_max,dpsi_worst,ratio_lo_worst,ratio_hi_worst\n")
+        for i, (x, T, px) in enumerate(zip(xs, Ts, pxs)):
+            D = math.sqrt(x)*math.log(x)**2
+            rem = psi[x] - px
+            rk = np.abs(rem - dpsi[i])/D
+            lo = max(0.0, abs(rem) - wc[i])/D; hi = (abs(rem) + wc[i])/D
+            worst = max(worst, wc[i]/D); spread = max(spread, float(rk.max() - rk.min()))
+            f.write(f"{x},{T:.0f},{abs(rem)/D:.12e},{dpsi[i].std():.3e},{dpsi[i].min():.3e},{dpsi[i].max():.3e},"
+                    f"{rk.min():.12e},{rk.max():.12e},{wc[i]:.3e},{lo:.12e},{hi:.12e}\n")
+    print(f"[ensemble] K={K} ({args.ensemble_mode}): max dispersion del ratio = {spread:.3e}, "
+          f"cota de peor caso del ratio <= {worst:.3e}")
+    print(path)
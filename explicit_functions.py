@@ -0,0 +1,108 @@
+# explicit_functions.py
+# psi, theta y pi(x) por sus formulas explicitas desde las mismas fases e^{i g log x}.
+#   psi:   x - sum_rho x^rho/rho - log(2 pi) - 1/2 log(1 - x^-2)          (formula actual)
+#   theta: sum_k mu(k) psi(x^{1/k}); ceros en k = 1, 2 y termino suave
+#          y - log(2 pi) - 1/2 log(1 - y^-2), y = x^{1/k}, para todo k >= 2
+#   pi:    sum_k mu(k)/k J(x^{1/k}) (serie de Riemann/Gram), J(y) = li(y) - log 2 +
+#          int_y^inf dt/(t(t^2-1) log t), menos sum_rho li(y^rho) en k = 1, 2 con la
+#          asintotica li(y^rho) ~ y^rho/(rho L) (1 + 1/(rho L) + 2/(rho L)^2), L = log y.
+# 2 Re li(y^rho) = S1/L + S2/L^2 + 2 S3/L^3 con S_m = 2 sqrt(y) Re sum e^{igL} rho^-m;
+# S1 es la suma de psi, asi que las tres funciones comparten cos/sin de cada tesela.
+# k = 2 es una segunda pasada en y = sqrt(x) con los mismos ceros y cortes T. Los
+# ceros en x^{1/k}, k >= 3, son O(x^{1/6}) y se omiten (ZERO_K en la cabecera CSV).
+
+import math
+import numpy as np
+import explicit_engine as ee
+
+FUNCTIONS = ("psi", "theta", "pi")
+ZERO_K = 2   # theta y pi llevan ceros en x^{1/k} para k <= ZERO_K
+EULER_GAMMA = 0.57721566490153286061
+
+def mobius(k):
+    m, n, p = 1, k, 2
+    while p*p <= n:
+        if n % p == 0:
+            n //= p
+            if n % p == 0: return 0
+            m = -m
+        p += 1
+    return -m if n > 1 else m
+
+def li(y):
+    # li(y) = Ei(log y), serie de terminos positivos para y > 1
+    u = math.log(y)
+    s, t, n = 0.0, 1.0, 0
+    while True:
+        n += 1
+        t *= u/n
+        d = t/n
+        s += d
+        if d < 1e-17*s: break
+    return EULER_GAMMA + math.log(u) + s
+
+_GL = np.polynomial.legendre.leggauss(32)
+
+def _j_tail(y):
+    # int_y^inf dt/(t(t^2-1) log t) con t = y e^s (integrando ~ e^{-2s}); Gauss-Legendre por tramos
+    ly = math.log(y)
+    u, w = _GL
+    tot = 0.0
+    for s0, s1 in ((0.0, 1.0), (1.0, 4.0), (4.0, 12.0), (12.0, 40.0)):
+        s = 0.5*(s1 - s0)*(u + 1.0) + s0
+        tot += 0.5*(s1 - s0)*float(np.dot(w, 1.0/((y*y*np.exp(2.0*s) - 1.0)*(ly + s))))
+    return tot
+
+def _smooth_psi(y):
+    return y - math.log(2.0*math.pi) - 0.5*math.log(1.0 - y**-2)
+
+def _smooth_J(y):
+    return li(y) - math.log(2.0) + _j_tail(y)
+
+def explicit_functions(xs, gammas, Ts, funcs, xblock=ee.XBLOCK, zblock=ee.ZBLOCK):
+    # {f: [valor explicito en cada x]} para f en funcs, una sola pasada sobre (x, cero)
+    g, a, b = ee.zero_coeffs(gammas)
+    sets = [(a, b)]
+    if "pi" in funcs:
+        r = 1.0/(0.5 + 1j*g)
+        for m in (2, 3):
+            c = r**m
+            sets.append((c.real, -c.imag))
+    ks = ee.cutoff_index(gammas, Ts)
+    S = ee.explicit_sums_many(xs, gammas, ks, sets, xblock, zblock)
+    if "theta" in funcs or "pi" in funcs:
+        # mismos conjuntos en y = sqrt(x): ceros del termino k = 2
+        ys = [math.sqrt(x) for x in xs]
+        S2 = ee.explicit_sums_many(ys, gammas, ks, sets, xblock, zblock)
+    out = {}
+    psi = [x - float(s) - (math.log(2.0*math.pi) + 0.5*math.log(1.0 - x**-2)) for x, s in zip(xs, S[0])]
+    if "psi" in funcs:
+        out["psi"] = psi
+    if "theta" in funcs:
+        th = []
+        for x, p in zip(xs, psi):
+            v, k = p, 2
+            while x**(1.0/k) >= 2.0:
+                mu = mobius(k)
+                if mu: v += mu*_smooth_psi(x**(1.0/k))
+                k += 1
+            if x >= 4.0:
+                v += float(S2[0, len(th)])   # mu(2) = -1: -psi(sqrt x) suma +S(sqrt x)
+            th.append(v)
+        out["theta"] = th
+    if "pi" in funcs:
+        pv = []
+        for i, x in enumerate(xs):
+            L = math.log(x)
+            v, k = 0.0, 1
+            while x**(1.0/k) >= 2.0:
+                mu = mobius(k)
+                if mu: v += mu/k*_smooth_J(x**(1.0/k))
+                k += 1
+            v -= S[0, i]/L + S[1, i]/(L*L) + 2.0*S[2, i]/(L**3)
+            if x >= 4.0:
+                Ly = math.log(ys[i])    # mu(2)/2 = -1/2 por -sum li(y^rho)
+                v += 0.5*(S2[0, i]/Ly + S2[1, i]/(Ly*Ly) + 2.0*S2[2, i]/(Ly**3))
+            pv.append(v)
+        out["pi"] = pv
+    return out
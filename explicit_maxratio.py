@@ -0,0 +1,170 @@
+# explicit_maxratio.py
+# Maximo global de |psi(x) - explicit_T(x)|/(sqrt(x) log^2 x) en x real de [xmin, xmax]
+# por ramificacion y poda, con la politica de explicit_compare_policy_param.py.
+#
+# En un intervalo [u, v) con T fijo, f(x) = psi(x) - P(x), P = psi_explicit_truncated(x, T):
+#   |f(x)| <= |f(m)| + (psi(v^-) - psi(u)) + |P'(m)| w/2 + M2 w^2/8,   w = v - u
+#   P'(x) = 1 - S'(x) - 1/(x^3 - x),  S'(x) = x^-1/2 sum_j (A_j cos + B_j sin)(g_j log x),
+#   A_j = a_j + 2 g_j b_j,  B_j = b_j - 2 g_j a_j,
+#   M2 = u^-3/2 sum_{j<k} (|a_j| + |b_j|)(1 + 2 g_j)(1/2 + g_j) + 3/(u^4 - u^2)
+# P'(m) sale de las mismas fases que P(m). D(x) = sqrt(x) log^2 x crece, asi que
+# ratio <= (cota de |f|)/D(u). Los intervalos se cortan en
+# los cambios de T (b1, b2 y g_j^2 en el tramo sqrt) y, si contienen potencias de
+# primo, en la mas cercana al centro. Se poda todo intervalo cuya cota no supere el
+# mejor valor evaluado; al terminar, max <= cota global (redondeo float aparte).
+#
+#   python explicit_maxratio.py --xmax 1000000 --xmin 100 --zeros canonical_idxgamma_T10000.txt
+#          --b1 300 --b2 3000 --Tmin_low 2000 --T_mid 3000 --T_high 5000 --out maxratio_E.json
+
+import argparse, heapq, json, math, time
+import numpy as np
+import explicit_engine as ee
+import psi_sieve as ps
+from explicit_compare_policy_param import read_gammas, policy_T, psi_explicit_truncated
+
+def breakpoints(xmin, xmax, b1, b2, Tmin_low, gammas):
+    # puntos donde cambia el corte k (T de la politica)
+    B = {float(xmin), float(xmax)}
+    for b in (b1, b2):
+        if xmin < b < xmax: B.add(float(b))
+    for g in gammas:
+        # tramo sqrt: T = sqrt(x) > Tmin_low cruza g en x = g^2
+        x = g*g
+        if x >= b1 or x >= xmax: break
+        if x > xmin and g > Tmin_low: B.add(x)
+    return sorted(B)
+
+class Problem:
+    def __init__(self, args, gammas, psi):
+        self.args = args
+        self.gammas = gammas
+        self.g, self.a, self.b = ee.zero_coeffs(gammas)
+        self.dA, self.dB = self.a + 2.0*self.g*self.b, self.b - 2.0*self.g*self.a
+        w = (np.abs(self.a) + np.abs(self.b))*(1.0 + 2.0*self.g)*(0.5 + self.g)
+        self.C2 = np.concatenate(([0.0], np.cumsum(w)))
+        self.psi = psi
+        pa = np.asarray(psi[np.arange(0, args.xmax + 1)] if hasattr(psi, "bound") else psi, dtype=np.float64)
+        self.pp = np.nonzero(np.diff(pa[:args.xmax + 1]))[0] + 1     # potencias de primo
+        self.evals = 0
+
+    def T(self, x):
+        a = self.args
+        return policy_T(x, a.b1, a.b2, a.Tmin_low, a.T_mid, a.T_high, self.gammas)
+
+    def f(self, xs):
+        # (psi(floor x) - P(x), P'(x), k) en x reales; P y P' con las mismas fases
+        Ts = [self.T(x) for x in xs]
+        ks = ee.cutoff_index(self.gammas, Ts)
+        S = ee.explicit_sums_many(xs, self.gammas, ks, [(self.a, self.b), (self.dA, self.dB)],
+                                  self.args.xblock, self.args.zblock)
+        self.evals += len(xs)
+        px = np.array([x - s - (math.log(2.0*math.pi) + 0.5*math.log(1.0 - x**-2)) for x, s in zip(xs, S[0])])
+        dpx = np.array([1.0 - s/(2.0*x) - 1.0/(x**3 - x) for x, s in zip(xs, S[1])])
+        pe = np.array([float(self.psi[int(math.floor(x))]) for x in xs])
+        return pe - px, dpx, ks
+
+    def bound(self, u, v, fm, dm, k):
+        w = v - u
+        var = float(self.psi[int(math.ceil(v)) - 1]) - float(self.psi[int(math.floor(u))])
+        M2 = self.C2[k]/u**1.5 + 3.0/(u**4 - u**2)
+        return (abs(fm) + var + 0.5*abs(dm)*w + 0.125*M2*w*w)/(math.sqrt(u)*math.log(u)**2)
+
+    def split(self, u, v):
+        # en la potencia de primo interior mas cercana al centro; si no hay, por la mitad
+        m = 0.5*(u + v)
+        i0, i1 = np.searchsorted(self.pp, [u, v], side="right")
+        if i1 > i0:
+            inner = self.pp[i0:i1]
+            inner = inner[(inner > u) & (inner < v)]
+            if inner.size:
+                c = float(inner[np.argmin(np.abs(inner - m))])
+                return [(u, c), (c, v)]
+        return [(u, m), (m, v)]
+
+def solve(prob, xmin, xmax, init, batch, rtol, max_evals, progress=False):
+    B = breakpoints(xmin, xmax, prob.args.b1, prob.args.b2, prob.args.Tmin_low, prob.gammas)
+    ivs = []
+    for lo, hi in zip(B[:-1], B[1:]):
+        n = max(1, int(round(init*math.log(hi/lo)/math.log(xmax/xmin))))
+        e = np.exp(np.linspace(math.log(lo), math.log(hi), n + 1))
+        e[0], e[-1] = lo, hi
+        ivs.extend(zip(e[:-1].tolist(), e[1:].tolist()))
+    # extremo derecho cerrado
+    fx, _, _ = prob.f([float(xmax)])
+    best = (abs(fx[0])/(math.sqrt(xmax)*math.log(xmax)**2), float(xmax))
+    heap = []
+
+    def push_all(pairs):
+        nonlocal best
+        ms = [0.5*(u + v) for u, v in pairs]
+        fm, dm, ks = prob.f(ms)
+        for (u, v), m, f, d, k in zip(pairs, ms, fm, dm, ks):
+            r = abs(f)/(math.sqrt(m)*math.log(m)**2)
+            if r > best[0]: best = (r, m)
+            ub = prob.bound(u, v, f, d, int(k))
+            heapq.heappush(heap, (-ub, u, v))
+
+    push_all(ivs)
+    it = 0
+    while heap and prob.evals < max_evals:
+        if -heap[0][0] <= best[0]*(1.0 + rtol): break
+        pairs = []
+        while heap and len(pairs) < 2*batch and -heap[0][0] > best[0]*(1.0 + rtol):
+            _, u, v = heapq.heappop(heap)
+            pairs.extend(prob.split(u, v))
+        push_all(pairs)
+        it += 1
+        if progress and it % 50 == 0:
+            print(f"[maxratio] evals={prob.evals} abiertos={len(heap)} mejor={best[0]:.6e} cota={-heap[0][0]:.6e}", flush=True)
+    ub = max(best[0], -heap[0][0]) if heap else best[0]
+    return best, ub, len(heap)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--xmax", type=int, required=True)
+    ap.add_argument("--xmin", type=int, default=100)
+    ap.add_argument("--zeros", required=True)
+    ap.add_argument("--b1", type=int, default=500)
+    ap.add_argument("--b2", type=int, default=3000)
+    ap.add_argument("--Tmin_low", type=float, default=700.0)
+    ap.add_argument("--T_mid", type=float, default=2000.0)
+    ap.add_argument("--T_high", type=float, default=5000.0)
+    ap.add_argument("--rtol", type=float, default=1e-3, help="para cuando cota <= mejor*(1+rtol)")
+    ap.add_argument("--init", type=int, default=512, help="intervalos iniciales (log-uniformes)")
+    ap.add_argument("--batch", type=int, default=256, help="intervalos partidos por ronda")
+    ap.add_argument("--max_evals", type=int, default=2000000)
+    ap.add_argument("--out", required=True, help="resumen JSON")
+    ap.add_argument("--progress", action="store_true")
+    ap.add_argument("--xblock", type=int, default=ee.XBLOCK)
+    ap.add_argument("--zblock", type=int, default=ee.ZBLOCK)
+    ps.add_psi_args(ap)
+    args = ap.parse_args()
+    if args.psi in ("segmented", "sublinear"):
+        raise SystemExit("explicit_maxratio necesita psi denso: --psi sieve o table")
+
+    t0 = time.time()
+    gammas = read_gammas(args.zeros)
+    psi = ps.psi_from_args(args, [], args.xmax)
+    if not hasattr(psi, "bound") and not isinstance(psi, np.ndarray):
+        raise SystemExit("explicit_maxratio necesita psi denso: sube --mem_budget o crea la tabla con psi_table.py")
+    prob = Problem(args, gammas, psi)
+    (r, xm), ub, nopen = solve(prob, max(2, args.xmin), args.xmax, args.init, args.batch, args.rtol,
+                               args.max_evals, args.progress)
+    T = prob.T(xm)
+    # comprobacion con la funcion escalar original en el maximizador
+    rs = abs(float(psi[int(math.floor(xm))]) - psi_explicit_truncated(xm, gammas, T))/(math.sqrt(xm)*math.log(xm)**2)
+    res = {
+        "xmin": args.xmin, "xmax": args.xmax,
+        "policy": {"b1": args.b1, "b2": args.b2, "Tmin_low": args.Tmin_low, "T_mid": args.T_mid, "T_high": args.T_high},
+        "MaxRatio": r, "x_at_max": xm, "T_used": T, "MaxRatio_scalar": rs,
+        "upper_bound": ub, "gap": ub - r, "certified": bool(ub <= r*(1.0 + args.rtol)),
+        "evaluations": prob.evals, "open_intervals": nopen, "seconds": round(time.time() - t0, 2),
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(res, f, indent=2)
+    print(f"[maxratio] MaxRatio={r:.6e} @ x={xm:.6f} (T={T:g})  cota global <= {ub:.6e}"
+          f"  evaluaciones={prob.evals}  {'certificado' if res['certified'] else 'SIN cerrar'}")
+    print(args.out)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+# explicit_server.py
+# Evaluador residente: carga los ceros y psi una vez y atiende peticiones JSON-lines.
+#
+#   python explicit_server.py --in peticiones.jsonl --out resultados.jsonl
+#   ... | python explicit_server.py                      # stdin -> stdout
+#
+# Una peticion por linea:
+#   {"id": "a", "xs": [100, 127, 1000], "T": 5000}
+#   {"id": "b", "xmax": 1000000, "points": 500, "xmin": 100,
+#    "policy": {"b1": 300, "b2": 3000, "Tmin_low": 2000, "T_mid": 3000, "T_high": 5000},
+#    "output": "policy_E_p500.csv", "engine": "numpy"}
+# xs explicitos o la rejilla de make_x_points; T fijo o policy; con "output" se escribe
+# el CSV de explicit_compare_policy_param.py y la respuesta lleva solo el resumen.
+# Cada respuesta: {"id", "hash", "cached", "ms", "summary", "rows" | "output"} o {"id", "error"}.
+#
+# Las peticiones corren en un pool de hilos (el trabajo numpy suelta el GIL); como
+# mucho --max_inflight pendientes: la lectura se detiene hasta que alguna termine.
+# Las respuestas salen en el orden de entrada. Memo por sha256 de la peticion
+# canonica (sin "id"); las repetidas no se recalculan.
+
+import argparse, hashlib, json, math, sys, threading, time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+import explicit_engine as ee
+import psi_sieve as ps
+import explicit_compare_policy_param as pp
+
+ENGINES = ("numpy", "nufft", "scalar")
+
+class Server:
+    def __init__(self, gammas, psi_src, psi_xmax, cache_size=1024):
+        self.gammas = gammas
+        self.glist = ee.scalar_list(gammas)
+        self.coeffs = ee.zero_coeffs(gammas)
+        self.psi_src = psi_src
+        self.psi = None; self.psi_bound = 0
+        self.lock = threading.Lock()
+        self.cache = OrderedDict(); self.cache_size = cache_size
+        self.inflight = {}   # hash -> Event de la peticion identica en curso
+        self._ensure_psi(psi_xmax)
+
+    def _ensure_psi(self, xmax):
+        # psi indexable hasta xmax; la tabla en disco si la hay, si no la criba (se amplia al doble)
+        with self.lock:
+            if xmax <= self.psi_bound: return self.psi
+            if self.psi_src is not None:
+                import psi_table
+                t = psi_table.open_table(self.psi_src, xmax)
+                if t is None:
+                    raise ValueError(f"la tabla psi no cubre x={xmax}")
+                self.psi, self.psi_bound = t, t.bound
+            else:
+                bound = max(int(xmax), 2*self.psi_bound)
+                self.psi, self.psi_bound = ps.psi_exact_upto(bound), bound
+            return self.psi
+
+    def evaluate(self, req):
+        if "xs" in req:
+            xs = sorted(set(int(x) for x in req["xs"]))
+        else:
+            xs = pp.make_x_points(int(req["xmax"]), int(req.get("points", 200)), int(req.get("xmin", 100)))
+        if not xs or xs[0] < 2:
+            raise ValueError("se requieren x >= 2")
+        if "policy" in req:
+            p = req["policy"]
+            Ts = [pp.policy_T(x, p.get("b1", 500), p.get("b2", 3000), p.get("Tmin_low", 700.0),
+                              p.get("T_mid", 2000.0), p.get("T_high", 5000.0), self.gammas) for x in xs]
+        elif "T" in req:
+            Ts = [min(float(req["T"]), self.gammas[-1])]*len(xs)
+        else:
+            raise ValueError("falta 'T' o 'policy'")
+        engine = req.get("engine", "numpy")
+        if engine not in ENGINES:
+            raise ValueError(f"engine desconocido: {engine}")
+        psi = self._ensure_psi(xs[-1])
+        if engine == "scalar":
+            pxs = [pp.psi_explicit_truncated(x, self.glist, T) for x, T in zip(xs, Ts)]
+        elif engine == "nufft":
+            pxs = ee.psi_explicit_nufft(xs, self.gammas, Ts, float(req.get("nufft_tol", ee.NUFFT_TOL)))
+        else:
+            pxs = ee.psi_explicit_block(xs, self.gammas, Ts, coeffs=self.coeffs)
+        rows, ratios = [], []
+        for x, T, px in zip(xs, Ts, pxs):
+            pe = float(psi[x]); rem = pe - px
+            ratio = abs(rem)/(math.sqrt(x)*math.log(x)**2)
+            rows.append([x, pe, px, rem, ratio, T]); ratios.append(ratio)
+        res = {"summary": ee.ratio_summary(xs, ratios)}
+        if req.get("output"):
+            pp.write_csv(req["output"], xs, Ts, pxs, psi)
+            res["output"] = req["output"]
+        else:
+            res["rows"] = rows
+        return res
+
+    def handle(self, req, key):
+        t0 = time.perf_counter()
+        while True:
+            with self.lock:
+                hit = self.cache.get(key)
+                if hit is not None:
+                    self.cache.move_to_end(key); break
+                ev = self.inflight.get(key)
+                if ev is None:
+                    ev = self.inflight[key] = threading.Event(); break
+            ev.wait()   # otra hebra calcula la misma peticion
+        cached = hit is not None
+        if not cached:
+            try:
+                hit = self.evaluate(req)
+                with self.lock:
+                    self.cache[key] = hit
+                    while len(self.cache) > self.cache_size: self.cache.popitem(last=False)
+            finally:
+                with self.lock: del self.inflight[key]
+                ev.set()
+        out = {"id": req.get("id"), "hash": key, "cached": cached}
+        out.update(hit)
+        out["ms"] = round(1000.0*(time.perf_counter() - t0), 3)
+        return out
+
+def request_key(req):
+    body = {k: v for k, v in req.items() if k != "id"}
+    return hashlib.sha256(json.dumps(body, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+def serve(server, fin, fout, threads, max_inflight):
+    slots = threading.BoundedSemaphore(max_inflight)
+    pending = deque()   # (id, futuro o respuesta ya hecha) en orden de entrada
+
+    def emit(block):
+        while pending and (block or isinstance(pending[0][1], dict) or pending[0][1].done()):
+            rid, fut = pending.popleft()
+            try:
+                out = fut if isinstance(fut, dict) else fut.result()
+            except Exception as e:
+                out = {"id": rid, "error": f"{type(e).__name__}: {e}"}
+            fout.write(json.dumps(out) + "\n"); fout.flush()
+
+    def run(req, key):
+        try:
+            return server.handle(req, key)
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for line in fin:
+            line = line.strip()
+            if not line: continue
+            try:
+                req = json.loads(line)
+                if not isinstance(req, dict): raise ValueError("la peticion debe ser un objeto JSON")
+            except ValueError as e:
+                pending.append((None, {"id": None, "error": f"json: {e}"}))
+                continue
+            slots.acquire()   # contrapresion: no se lee mas hasta que haya hueco
+            pending.append((req.get("id"), pool.submit(run, req, request_key(req))))
+            emit(False)
+        emit(True)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--zeros", default="canonical_idxgamma_T10000.txt")
+    ap.add_argument("--in", dest="fin", default="-", help="fichero JSON-lines de peticiones (- = stdin)")
+    ap.add_argument("--out", default="-", help="fichero JSON-lines de respuestas (- = stdout)")
+    ap.add_argument("--psi_xmax", type=float, default=1e6, help="criba psi precargada (se amplia si hace falta)")
+    ap.add_argument("--psi_table", default=None, help="directorio de psi_table.py (en vez de la criba)")
+    ap.add_argument("--threads", type=int, default=4)
+    ap.add_argument("--max_inflight", type=int, default=16, help="peticiones pendientes como maximo")
+    ap.add_argument("--cache", type=int, default=1024, help="resultados memorizados (LRU)")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    server = Server(pp.read_gammas(args.zeros), args.psi_table, int(args.psi_xmax), args.cache)
+    print(f"[server] {len(server.gammas)} ceros, psi hasta {server.psi_bound}: "
+          f"{time.perf_counter()-t0:.2f} s", file=sys.stderr, flush=True)
+    fin = sys.stdin if args.fin == "-" else open(args.fin, "r", encoding="utf-8-sig")
+    fout = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8")
+    try:
+        serve(server, fin, fout, args.threads, args.max_inflight)
+    finally:
+        if fin is not sys.stdin: fin.close()
+        if fout is not sys.stdout: fout.close()
+
+if __name__ == "__main__":
+    main()
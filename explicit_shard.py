@@ -0,0 +1,103 @@
+# explicit_shard.py
+# Sumas explicitas repartidas por rangos de indice de cero entre nodos que solo
+# comparten un directorio. El shard i/n suma los ceros j en [i*N/n, (i+1)*N/n) y
+# guarda, para cada x de la rejilla y cada corte distinto k de la politica,
+#   S_i(x, k) = sum_{lo <= j < min(k, hi)} 2 sqrt(x) (a_j cos + b_j sin)(g_j log x)
+# en <out>_shard<i>of<n>.npz. La fusion comprueba que los shards cubren [0, N) una
+# vez, con la misma rejilla, cortes y hash de ceros, suma (fsum) y escribe el CSV
+# de explicit_compare_policy_param.py.
+#
+#   python explicit_compare_policy_param.py ... --out E.csv --shard 0/4     # en cada nodo, i = 0..3
+#   python explicit_compare_policy_param.py ... --out E.csv --merge E_shard*.npz
+
+import glob, hashlib, json, math
+import numpy as np
+import explicit_engine as ee
+
+SHARD_VERSION = 1
+
+def parse_shard(s):
+    try:
+        i, n = (int(v) for v in s.split("/"))
+    except ValueError:
+        raise SystemExit(f"--shard: formato i/n, no {s!r}")
+    if not (n >= 1 and 0 <= i < n):
+        raise SystemExit(f"--shard {s}: se requiere 0 <= i < n")
+    return i, n
+
+def shard_range(N, i, n):
+    return (N*i)//n, (N*(i + 1))//n
+
+def zeros_hash(gammas):
+    # sha256 de los ceros ordenados en float64 (little-endian)
+    return hashlib.sha256(np.asarray(gammas, dtype="<f8").tobytes()).hexdigest()
+
+def grid_hash(xs, ks):
+    return hashlib.sha256(np.asarray(xs, dtype="<i8").tobytes() + np.asarray(ks, dtype="<i8").tobytes()).hexdigest()
+
+def shard_path(out, i, n):
+    return out.rsplit(".", 1)[0] + f"_shard{i:04d}of{n:04d}.npz"
+
+def run_shard(args, gammas, xs, Ts):
+    i, n = parse_shard(args.shard)
+    N = len(gammas)
+    lo, hi = shard_range(N, i, n)
+    ks = ee.cutoff_index(gammas, Ts)
+    cuts = np.unique(ks)
+    # cortes locales del shard: ceros [lo, min(k, hi)) -> prefijo de longitud clip(k - lo)
+    Kl = np.clip(cuts - lo, 0, hi - lo)
+    S = ee.explicit_sums_multi(xs, gammas[lo:hi], np.broadcast_to(Kl, (len(xs), cuts.size)),
+                               args.xblock, args.zblock)
+    path = shard_path(args.out, i, n)
+    meta = {"version": SHARD_VERSION, "shard": i, "nshards": n, "lo": lo, "hi": hi, "zeros_total": N,
+            "zeros_sha256": zeros_hash(gammas), "grid_sha256": grid_hash(xs, ks), "zeros": args.zeros,
+            "policy": {"b1": args.b1, "b2": args.b2, "Tmin_low": args.Tmin_low, "T_mid": args.T_mid, "T_high": args.T_high}}
+    with open(path, "wb") as f:   # np.savez anade .npz si el nombre no lo lleva
+        np.savez(f, xs=np.asarray(xs, dtype=np.int64), Ts=np.asarray(Ts, dtype=np.float64), ks=ks,
+                 cuts=cuts, sums=S, meta=np.array(json.dumps(meta)))
+    print(f"[shard] {i}/{n}: ceros [{lo}, {hi}) de {N}, {len(xs)} x, {cuts.size} cortes")
+    print(path)
+
+def merge_shards(args, gammas, xs, Ts):
+    # (pxs) a partir de los ficheros de --merge, tras validar que encajan
+    files = sorted({p for pat in args.merge for p in (glob.glob(pat) or [pat])})
+    if not files:
+        raise SystemExit("--merge: sin ficheros")
+    ks = ee.cutoff_index(gammas, Ts)
+    zsha, gsha = zeros_hash(gammas), grid_hash(xs, ks)
+    parts = []
+    for p in files:
+        with np.load(p) as z:
+            meta = json.loads(str(z["meta"]))
+            if meta.get("version") != SHARD_VERSION:
+                raise SystemExit(f"{p}: version de shard {meta.get('version')} != {SHARD_VERSION}")
+            if meta["zeros_sha256"] != zsha or meta["zeros_total"] != len(gammas):
+                raise SystemExit(f"{p}: los ceros no coinciden con --zeros {args.zeros}")
+            if meta["grid_sha256"] != gsha or not np.array_equal(z["xs"], np.asarray(xs, dtype=np.int64)):
+                raise SystemExit(f"{p}: rejilla x o cortes distintos (xmax/points/xmin/politica)")
+            parts.append((meta["lo"], meta["hi"], meta["nshards"], z["cuts"].copy(), z["sums"].copy(), p))
+    parts.sort(key=lambda t: t[0])
+    n = parts[0][2]
+    pos = 0
+    for lo, hi, nn, cuts, _, p in parts:
+        if nn != n:
+            raise SystemExit(f"{p}: {nn} shards, otros ficheros dicen {n}")
+        if lo != pos:
+            raise SystemExit(f"--merge: ceros [{pos}, {lo}) sin shard" if lo > pos else f"{p}: solapa ceros desde {lo}")
+        pos = hi
+    if pos != len(gammas):
+        raise SystemExit(f"--merge: ceros [{pos}, {len(gammas)}) sin shard")
+    cuts = parts[0][3]
+    col = np.searchsorted(cuts, ks)
+    pxs = []
+    for r, x in enumerate(xs):
+        s = math.fsum(float(P[4][r, col[r]]) for P in parts)
+        pxs.append(x - s - (math.log(2.0*math.pi) + 0.5*math.log(1.0 - x**-2)))
+    print(f"[merge] {len(parts)} shards, {len(gammas)} ceros, {len(xs)} x")
+    return pxs
+
+def add_shard_args(ap):
+    ap.add_argument("--shard", default=None,
+                    help="i/n: solo los ceros del rango i de n; escribe <out>_shard<i>of<n>.npz y no el CSV")
+    ap.add_argument("--merge", nargs="+", default=None,
+                    help="ficheros (o patrones) de --shard a sumar; escribe el CSV en --out")
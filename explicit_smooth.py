@@ -0,0 +1,114 @@
+# explicit_smooth.py
+# Formula explicita suavizada en log x. Con un nucleo k >= 0 en [0,1], int k = 1,
+# y delta = c/T:
+#   Psi_d(x) = int_0^1 psi(x e^{-delta v}) k(v) dv
+#            = psi(x e^{-delta}) + sum_{x e^{-delta} < n <= x} Lambda(n) H(log(x/n)/delta)
+#            = x K(delta) - sum_rho x^rho/rho K(rho delta) - log(2 pi) - 1/2 int log(1 - x^-2 e^{2 delta v}) k(v) dv
+# con K(s) = int_0^1 e^{-s v} k(v) dv y H(s) = int_0^s k. Cada cero se pondera por
+# K(rho delta), que decae con gamma*delta segun la suavidad de k: la suma truncada
+# en T converge mucho antes que la de corte abrupto.
+#
+# Nucleos (t = 2v - 1 en [-1,1]):
+#   cubic     (1-|t|)^3_+    el de close_stepA.py (hat_g)
+#   triweight (1-t^2)^3
+#   bump      exp(-1/(1-t^2))
+
+import math
+import numpy as np
+import explicit_engine as ee
+
+KERNELS = {
+    "cubic": lambda t: (1.0 - np.abs(t))**3,
+    "triweight": lambda t: (1.0 - t*t)**3,
+    "bump": lambda t: np.exp(-1.0/np.maximum(1.0 - t*t, 1e-300)),
+}
+SMOOTH_C = 8.0
+GL_NODES = 96      # Gauss-Legendre por mitad de [0,1] (cubic tiene un pico en v = 1/2)
+H_GRID = 4096      # tabla de H para interpolacion de Hermite cubica
+
+class Kernel:
+    def __init__(self, name):
+        f = KERNELS[name]
+        self.name = name
+        self._f = f
+        u, w = np.polynomial.legendre.leggauss(GL_NODES)
+        v = np.concatenate((0.25*(u + 1.0), 0.5 + 0.25*(u + 1.0)))
+        wt = np.concatenate((0.25*w, 0.25*w))
+        self.Z = float(np.dot(wt, f(2.0*v - 1.0)))
+        self.v, self.w = v, wt*f(2.0*v - 1.0)/self.Z   # K(s) = sum w e^{-s v}
+        # H en una rejilla fina (GL de 8 nodos por celda) para interpolar
+        u8, w8 = np.polynomial.legendre.leggauss(8)
+        e = np.linspace(0.0, 1.0, H_GRID + 1)
+        hc = 0.5/H_GRID
+        mid = 0.5*(e[:-1] + e[1:])
+        cells = (hc*w8[None, :]*f(2.0*(mid[:, None] + hc*u8[None, :]) - 1.0)).sum(axis=1)/self.Z
+        self.Hgrid = np.concatenate(([0.0], np.cumsum(cells)))
+        self.Hgrid /= self.Hgrid[-1]
+
+    def k(self, v):
+        return self._f(2.0*np.asarray(v) - 1.0)/self.Z
+
+    def K(self, s):
+        # transformada de Laplace en [0,1], s real o complejo (array)
+        s = np.asarray(s)
+        return np.exp(-s[..., None]*self.v).dot(self.w)
+
+    def H(self, s):
+        # int_0^s k, s en [0,1] (Hermite cubica con H' = k)
+        s = np.clip(np.asarray(s, dtype=np.float64), 0.0, 1.0)
+        h = 1.0/H_GRID
+        i = np.minimum((s*H_GRID).astype(np.int64), H_GRID - 1)
+        t = (s - i*h)/h
+        h00 = (1 + 2*t)*(1 - t)**2; h10 = t*(1 - t)**2; h01 = t*t*(3 - 2*t); h11 = t*t*(t - 1)
+        return (h00*self.Hgrid[i] + h10*h*self.k(i*h) + h01*self.Hgrid[i+1] + h11*h*self.k((i+1)*h))
+
+def psi_smoothed_exact(x, delta, kern, psi):
+    # Psi_d(x) con psi indexable por enteros (criba densa o psi_table)
+    lo = int(math.floor(x*math.exp(-delta)))
+    n = np.arange(lo + 1, x + 1)
+    pv = np.asarray(psi[np.arange(lo, x + 1)], dtype=np.float64) if hasattr(psi, "bound") \
+         else np.array([psi[m] for m in range(lo, x + 1)], dtype=np.float64)
+    lam = np.diff(pv)
+    s = np.log(x/n)/delta
+    return float(pv[0] + math.fsum((lam*kern.H(s)).tolist()))
+
+def psi_smoothed_explicit(xs, gammas, Ts, kern, c, engine="numpy", tol=ee.NUFFT_TOL,
+                          xblock=ee.XBLOCK, zblock=ee.ZBLOCK):
+    # lado explicito de Psi_d(x); un juego de pesos K(rho*delta) por cada T distinto
+    g = np.asarray(gammas, dtype=np.float64)
+    ks = ee.cutoff_index(gammas, Ts)
+    Ts = np.asarray(Ts, dtype=np.float64)
+    out = np.zeros(len(xs))
+    for T in np.unique(Ts):
+        sel = np.nonzero(Ts == T)[0]
+        delta = c/T
+        k = int(ks[sel[0]])
+        rho = 0.5 + 1j*g[:k]
+        w = kern.K(rho*delta)/rho            # x^rho/rho K(rho d) = sqrt(x) e^{i g L} w
+        coeffs = (g[:k], w.real, -w.imag)     # 2 sqrt(x) (a cos + b sin) con a - i b = w
+        xsel = [xs[i] for i in sel]
+        if engine == "nufft":
+            S = ee.explicit_sums_nufft(xsel, g[:k], ks[sel], tol, xblock, zblock, coeffs)
+        else:
+            S = ee.explicit_sums(xsel, g[:k], ks[sel], xblock, zblock, coeffs)
+        Kd = float(kern.K(np.array(delta)).real)
+        for j, i in enumerate(sel):
+            x = xs[i]
+            triv = float(np.dot(kern.w, np.log(1.0 - x**-2.0*np.exp(2.0*delta*kern.v))))
+            out[i] = x*Kd - S[j] - math.log(2.0*math.pi) - 0.5*triv
+    return out.tolist()
+
+def smoothed_values(xs, gammas, Ts, psi, args):
+    # (pxs, pes): lado explicito y exacto de Psi_d en cada x
+    if not hasattr(psi, "bound") and not isinstance(psi, (list, np.ndarray)):
+        raise SystemExit("--smooth requiere psi denso: --psi sieve o --psi table")
+    kern = Kernel(args.smooth)
+    pxs = psi_smoothed_explicit(xs, gammas, Ts, kern, args.smooth_c, args.engine,
+                                getattr(args, "nufft_tol", ee.NUFFT_TOL), args.xblock, args.zblock)
+    pes = {x: psi_smoothed_exact(x, args.smooth_c/T, kern, psi) for x, T in zip(xs, Ts)}
+    return pxs, pes
+
+def add_smooth_args(ap):
+    ap.add_argument("--smooth", choices=["none"] + list(KERNELS), default="none",
+                    help="pondera cada cero por K(rho*c/T) y compara con psi suavizado en log x")
+    ap.add_argument("--smooth_c", type=float, default=SMOOTH_C, help="ancho del nucleo: delta = c/T")
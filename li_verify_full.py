@@ -31,8 +31,13 @@ from pathlib import Path
 # Import Criterio from same directory
 sys.path.insert(0, str(Path(__file__).resolve().parent))
 import Criterio as C
+import zero_store
 
 def load_gammas(path: Path):
+    # <path>.bin de zero_store.py si esta al dia y el texto ya venia ordenado
+    zs = zero_store.open_sidecar(str(path))
+    if zs is not None and zs.header["sorted"] and len(zs):
+        return zs.g.tolist()
     gammas = []
     with path.open('r', encoding='utf-8', errors='ignore') as f:
         for ln in f:
@@ -0,0 +1,308 @@
+# psi_sieve.py
+# psi(x) = sum_{n<=x} Lambda(n) para los scripts explicit_*.
+# Modo denso: criba NumPy (tabla de primos solo impares, mascara uint8) que
+# marca Lambda en primos y potencias de primos y acumula en float64; ~9 B por
+# entero frente a ~100 B de las listas spf/logp/lam/psi.
+# Modo segmentado: recorre [0, xmax] en segmentos de tamano fijo con una
+# criba de Eratostenes por segmento (primos base <= sqrt(xmax)) y solo
+# devuelve psi en los x pedidos. Memoria O(sqrt(xmax) + segmento); los
+# segmentos se reparten en un Pool y los desplazamientos prefijo se
+# combinan al final en orden.
+
+import math, os
+import multiprocessing as mpc
+try:
+    import numpy as np
+except ImportError:  # explicit_compare_npyfree.py con --psi sieve no necesita numpy
+    np = None
+
+SEGMENT = 1 << 22   # 4M enteros: ~36 MB entre mascara, Lambda y acumulado
+
+def primes_upto(n):
+    # Eratostenes solo impares: odd[i] <-> 2i+3, 1 byte por cada 2 enteros
+    n = int(n)
+    if n < 2: return np.zeros(0, dtype=np.int64)
+    odd = np.ones((n-1)//2, dtype=np.uint8)
+    for i in range((math.isqrt(n)-1)//2):
+        if odd[i]:
+            p = 2*i+3
+            odd[(p*p-3)//2::p] = 0
+    return np.concatenate([np.array([2], dtype=np.int64), 2*np.nonzero(odd)[0].astype(np.int64)+3])
+
+def log_ints(ns, chunk=1 << 20):
+    # math.log por bloques: mismos bits que los scripts originales (np.log difiere en ~1 ulp)
+    out = np.empty(len(ns))
+    for i in range(0, len(ns), chunk):
+        c = ns[i:i+chunk]
+        out[i:i+len(c)] = np.fromiter(map(math.log, c.tolist()), dtype=np.float64, count=len(c))
+    return out
+
+def theta_pi_at(xs, xmax):
+    # theta(x) = sum_{p<=x} log p y pi(x) en los x pedidos, de una sola criba de primos
+    pr = primes_upto(xmax)
+    cum = np.cumsum(log_ints(pr))
+    i = np.searchsorted(pr, np.asarray(xs, dtype=np.int64), side="right")
+    th = np.where(i > 0, cum[np.maximum(i-1, 0)], 0.0)
+    return ({x: float(t) for x, t in zip(xs, th)}, {x: int(c) for x, c in zip(xs, i)})
+
+def psi_exact_upto(xmax, compensated=False):
+    # psi[n] para 0<=n<=xmax como float64: Lambda marcado directamente en primos
+    # y potencias de primos y acumulado con cumsum (mismo orden que el bucle
+    # original, asi que los valores son identicos bit a bit). compensated=True
+    # acumula por bloques con desplazamientos compensados (Kahan).
+    if np is None:
+        return _psi_exact_lists(xmax)
+    xmax = int(xmax)
+    lam = np.zeros(xmax+1)
+    pr = primes_upto(xmax)
+    lam[pr] = log_ints(pr)
+    for p in pr[:np.searchsorted(pr, math.isqrt(xmax), side="right")].tolist():
+        lp = lam[p]; pk = p*p
+        while pk <= xmax:
+            lam[pk] = lp; pk *= p
+    if not compensated:
+        return np.cumsum(lam, out=lam)
+    B = 1 << 16
+    off = 0.0; comp = 0.0
+    for i in range(0, xmax+1, B):
+        blk = lam[i:i+B]
+        tot = math.fsum(blk)
+        np.cumsum(blk, out=blk)
+        blk += (off - comp)
+        y = tot - comp; t = off + y
+        comp = (t - off) - y; off = t
+    return lam
+
+def _psi_exact_lists(xmax):
+    # Version original por SPF en listas (solo si no hay numpy)
+    spf=list(range(xmax+1))
+    for i in range(2,int(xmax**0.5)+1):
+        if spf[i]==i:
+            for j in range(i*i, xmax+1, i):
+                if spf[j]==j: spf[j]=i
+    logp=[0.0]*(xmax+1)
+    for i in range(2,xmax+1):
+        if spf[i]==i: logp[i]=math.log(i)
+    lam=[0.0]*(xmax+1)
+    for n in range(2,xmax+1):
+        p=spf[n]; m=n
+        while m%p==0: m//=p
+        if m==1: lam[n]=logp[p]
+    psi=[0.0]*(xmax+1); run=0.0
+    for n in range(1,xmax+1):
+        run+=lam[n]; psi[n]=run
+    return psi
+
+def segment_lambda(lo, hi, base):
+    # Lambda(n) para n en [lo, hi); base = primos <= sqrt(hi-1)
+    isp = np.ones(hi-lo, dtype=bool)
+    if lo < 2: isp[:2-lo] = False
+    for p in base:
+        p = int(p)
+        if p*p >= hi: break
+        start = max(p*p, -(-lo//p)*p)
+        isp[start-lo::p] = False
+    lam = np.zeros(hi-lo)
+    idx = np.nonzero(isp)[0]
+    lam[idx] = log_ints(idx + lo)
+    # potencias p^k (k>=2): solo primos base
+    for p in base:
+        p = int(p)
+        pk = p*p
+        if pk >= hi: break
+        lp = math.log(p)
+        while pk < hi:
+            if pk >= lo: lam[pk-lo] = lp
+            pk *= p
+    return lam
+
+_BASE = None
+
+def _init_worker(base):
+    global _BASE
+    _BASE = base
+
+def _segment_task(task):
+    lo, hi, pts = task
+    lam = segment_lambda(lo, hi, _BASE)
+    vals = np.cumsum(lam)[np.asarray(pts, dtype=np.int64) - lo] if pts else np.zeros(0)
+    return float(lam.sum()), vals
+
+def psi_at_points(xs, xmax=None, segment=SEGMENT, workers=1):
+    # {x: psi(x)} para los enteros xs; el resto de [0,xmax] no se guarda
+    pts = sorted(set(int(x) for x in xs))
+    if not pts: return {}
+    xmax = int(xmax if xmax is not None else pts[-1])
+    base = primes_upto(math.isqrt(xmax))
+    tasks = []; j = 0
+    for lo in range(0, xmax+1, segment):
+        hi = min(lo+segment, xmax+1)
+        k = j
+        while k < len(pts) and pts[k] < hi: k += 1
+        tasks.append((lo, hi, pts[j:k])); j = k
+    if workers > 1 and len(tasks) > 1:
+        pool = mpc.Pool(processes=workers, initializer=_init_worker, initargs=(base,))
+        results = pool.imap(_segment_task, tasks)
+    else:
+        pool = None
+        _init_worker(base)
+        results = map(_segment_task, tasks)
+    out = {}
+    off = 0.0; comp = 0.0   # suma compensada de los totales por segmento
+    try:
+        for (lo, hi, seg_pts), (tot, vals) in zip(tasks, results):
+            for x, v in zip(seg_pts, vals):
+                out[x] = (off - comp) + float(v)
+            y = tot - comp; t = off + y
+            comp = (t - off) - y; off = t
+    finally:
+        if pool is not None:
+            pool.close(); pool.join()
+    return out
+
+def theta_sublinear(x):
+    # theta(x) = sum_{p<=x} log p en O(x^{3/4}) tiempo y O(sqrt x) memoria.
+    # Criba de Lucy sobre v in {x//i}: S(v) cuenta los n in [2,v] aun no cribados
+    # y D(v) suma sus log n. Al cribar el primo p se quitan los n = p*m con
+    # m en el conjunto restante de [p, v/p]:
+    #   S(v) -= S(v/p) - S(p-1)
+    #   D(v) -= log p*(S(v/p) - S(p-1)) + D(v/p) - D(p-1)
+    # (log es aditivo, asi que D sigue a S). D(v,1) = log(v!) via lgamma.
+    # NO es exacto: D parte de log(v!) ~ v log v (2.7e13 en v = 1e12) y las restas
+    # cancelan casi todo, asi que el error absoluto crece como ~u * x log x: ~1e-6
+    # en x = 1e9, del orden de 1e-3 en x = 1e12 (relativo ~1e-15 a theta).
+    x = int(x)
+    if x < 2: return 0.0
+    r = math.isqrt(x)
+    vs = np.arange(r+1, dtype=np.int64)
+    Ss = vs - 1; Ss[0] = 0
+    Ds = np.array([math.lgamma(v+1.0) for v in range(r+1)])
+    vl = x // np.arange(1, r+1, dtype=np.int64)
+    vl = np.concatenate(([0], vl))                     # indice i -> v = x//i
+    Sl = vl - 1; Sl[0] = 0
+    Dl = np.array([0.0] + [math.lgamma(v+1.0) for v in vl[1:].tolist()])
+    for p in primes_upto(r).tolist():
+        sp, dp, lp = Ss[p-1], Ds[p-1], math.log(p)
+        p2 = p*p
+        lim = min(r, x//p2)
+        i1 = min(lim, r//p)                            # i*p <= r: v/p es un valor grande
+        Sq = np.empty(lim, dtype=np.int64); Dq = np.empty(lim)
+        Sq[:i1] = Sl[p:p*i1+1:p]; Dq[:i1] = Dl[p:p*i1+1:p]
+        if lim > i1:
+            q = x // (np.arange(i1+1, lim+1, dtype=np.int64)*p)
+            Sq[i1:] = Ss[q]; Dq[i1:] = Ds[q]
+        Sq -= sp; Dq -= dp
+        Sl[1:lim+1] -= Sq
+        Dl[1:lim+1] -= lp*Sq + Dq
+        if p2 <= r:
+            q = vs[p2:]//p
+            cnt = Ss[q] - sp
+            Ds[p2:] -= lp*cnt + (Ds[q] - dp)
+            Ss[p2:] -= cnt
+    return float(Dl[1])
+
+def _iroot(x, k):
+    y = int(round(x**(1.0/k)))
+    while y**k > x: y -= 1
+    while (y+1)**k <= x: y += 1
+    return y
+
+def psi_sublinear(x):
+    # psi(x) = theta(x) + sum_{k>=2} theta(x^{1/k}); las raices usan primos <= sqrt x
+    x = int(x)
+    if x < 2: return 0.0
+    pr = primes_upto(math.isqrt(x))
+    lp = log_ints(pr)
+    parts = [theta_sublinear(x)]
+    k = 2
+    while 2**k <= x:
+        parts.append(math.fsum(lp[:np.searchsorted(pr, _iroot(x, k), side="right")]))
+        k += 1
+    return math.fsum(parts)
+
+def psi_sublinear_points(xs, dense_upto=10**7):
+    # Puntos bajos de la criba densa (barata); el resto uno a uno en O(x^{3/4})
+    pts = sorted(set(int(x) for x in xs))
+    low = [x for x in pts if x <= dense_upto]
+    out = {}
+    if low:
+        psi = psi_exact_upto(low[-1])
+        out.update((x, float(psi[x])) for x in low)
+    for x in pts[len(low):]:
+        out[x] = psi_sublinear(x)
+    return out
+
+def add_psi_args(ap):
+    ap.add_argument("--psi", choices=["auto","sieve","segmented","table","sublinear"], default="auto",
+                    help="auto: tabla persistente si existe y cubre xmax, si no sieve si cabe en RAM, si no "
+                         "segmented/sublinear segun engine_plan.py; sieve: tabla densa "
+                         "hasta xmax; segmented: criba por segmentos, psi solo en los x pedidos; table: psi_table.py; "
+                         "sublinear: Lucy/Meissel-Lehmer por punto, O(x^{3/4}), en float64: no exacto, "
+                         "error absoluto ~u*x*log x (~1e-3 en x = 1e12)")
+    ap.add_argument("--psi_table", default=None, help="directorio de la tabla (por defecto ./psi_table junto a los scripts)")
+    ap.add_argument("--segment", type=int, default=SEGMENT, help="enteros por segmento (--psi segmented)")
+    ap.add_argument("--mem_budget", default=None,
+                    help="memoria maxima (ej. 512M, 2G): ajusta segmentos y teselas, cambia la criba densa "
+                         "por la segmentada si no cabe e informa del pico de RSS al terminar")
+    ap.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2)//2),
+                    help="procesos para la criba segmentada")
+    ap.add_argument("--psi_compensated", action="store_true",
+                    help="acumulado por bloques con suma compensada (por defecto: identico al bucle original)")
+
+def psi_from_args(args, xs, xmax):
+    # Devuelve algo indexable psi[x] para todos los x de xs (None con --plan: no se calcula)
+    mode = args.psi
+    if getattr(args, "mem_budget", None):
+        import engine_plan
+        engine_plan.apply_mem_budget(args)
+    if mode == "auto" or getattr(args, "plan", False) or (mode == "sieve" and getattr(args, "mem_budget", None)):
+        import engine_plan
+        mode = engine_plan.pick_psi(xs, xmax, args)
+        if getattr(args, "plan", False):
+            return None
+    if mode == "table" and np is not None:
+        import psi_table
+        t = psi_table.open_table(args.psi_table or psi_table.DEFAULT_DIR, xmax)
+        if t is not None:
+            return t
+        raise SystemExit(f"sin tabla psi que cubra xmax={xmax}: python psi_table.py --bound {xmax}")
+    if mode in ("segmented", "sublinear") and np is None:
+        raise SystemExit(f"--psi {mode} requiere numpy")
+    if mode == "segmented":
+        return psi_at_points(xs, xmax, args.segment, args.workers)
+    if mode == "sublinear":
+        return psi_sublinear_points(xs)
+    return psi_exact_upto(xmax, compensated=args.psi_compensated)
+
+def main():
+    # Contraste del modo sublinear contra la criba densa: python psi_sieve.py --check 1e8
+    # y en un x lejano (--far) contra la criba segmentada
+    import argparse, random, time
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--check", type=float, required=True, help="xmax del contraste (criba densa hasta ahi)")
+    ap.add_argument("--samples", type=int, default=20)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--far", type=float, default=1e10,
+                    help="x suelto contra la criba segmentada (1e10: ~4.5 min con 1 proceso; 0 = omitir)")
+    ap.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2)//2))
+    args = ap.parse_args()
+    xmax = int(args.check)
+    rnd = random.Random(args.seed)
+    xs = sorted(set([xmax, 2, 3, 4, 100] + [rnd.randint(2, xmax) for _ in range(args.samples)]))
+    t0 = time.time(); psi = psi_exact_upto(xmax); t1 = time.time()
+    worst = 0.0
+    for x in xs:
+        d = abs(psi_sublinear(x) - float(psi[x]))
+        worst = max(worst, d/max(1.0, float(psi[x])))
+    t2 = time.time()
+    print(f"[check] {len(xs)} x <= {xmax}: max rel dev sublinear vs sieve = {worst:.3e}  "
+          f"(sieve {t1-t0:.1f}s, sublinear {t2-t1:.1f}s)")
+    if args.far:
+        x = int(args.far)
+        t0 = time.time(); seg = psi_at_points([x], x, SEGMENT, args.workers)[x]; t1 = time.time()
+        sub = psi_sublinear(x); t2 = time.time()
+        print(f"[check] x = {x}: sublinear - segmented = {sub - seg:.3e} (rel {abs(sub - seg)/seg:.3e})  "
+              f"(segmented {t1-t0:.1f}s, sublinear {t2-t1:.1f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# psi_table.py
+# Tabla persistente y dispersa de potencias de primos para consultas psi(x).
+# Solo guarda las posiciones n = p^k <= bound (uint64) y psi acumulado en
+# cada una (float64), en binario crudo mapeado en memoria; psi(x) es una
+# busqueda binaria. Extender el bound anade al final sin reconstruir.
+#
+#   python psi_table.py --bound 1000000000            # crea o extiende ./psi_table
+#   python psi_table.py --bound 2000000000 --dir D     # extiende D
+#
+# Acumulado secuencial (como psi_sieve.psi_exact_upto): los valores son
+# identicos bit a bit a los de la criba densa.
+
+import argparse, json, math, os
+import multiprocessing as mpc
+import numpy as np
+import psi_sieve as ps
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "psi_table")
+
+def _read_meta(d):
+    p = os.path.join(d, "meta.json")
+    if not os.path.exists(p):
+        return {"bound": 1, "count": 0, "last": 0.0}
+    with open(p, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _write_meta(d, meta):
+    tmp = os.path.join(d, "meta.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, os.path.join(d, "meta.json"))
+
+def _segment_pp_task(task):
+    lo, hi = task
+    lam = ps.segment_lambda(lo, hi, ps._BASE)
+    idx = np.nonzero(lam)[0]
+    return (idx + lo).astype(np.uint64), lam[idx]
+
+def extend(d, bound, segment=ps.SEGMENT, workers=1, progress=False):
+    # Anade las potencias de primos de (bound_actual, bound] al final de la tabla
+    os.makedirs(d, exist_ok=True)
+    meta = _read_meta(d)
+    bound = int(bound)
+    pos_path, cum_path = os.path.join(d, "pos.u64"), os.path.join(d, "cum.f64")
+    # Descarta colas escritas despues del ultimo meta.json consistente
+    for p, w in ((pos_path, 8), (cum_path, 8)):
+        if os.path.exists(p) and os.path.getsize(p) != meta["count"]*w:
+            with open(p, "r+b") as f: f.truncate(meta["count"]*w)
+    if bound <= meta["bound"]:
+        return meta
+    base = ps.primes_upto(math.isqrt(bound))
+    tasks = [(lo, min(lo+segment, bound+1)) for lo in range(meta["bound"]+1, bound+1, segment)]
+    if workers > 1 and len(tasks) > 1:
+        pool = mpc.Pool(processes=workers, initializer=ps._init_worker, initargs=(base,))
+        results = pool.imap(_segment_pp_task, tasks)
+    else:
+        pool = None
+        ps._init_worker(base)
+        results = map(_segment_pp_task, tasks)
+    last = meta["last"]
+    try:
+        with open(pos_path, "ab") as fp, open(cum_path, "ab") as fc:
+            for i, ((lo, hi), (pos, vals)) in enumerate(zip(tasks, results)):
+                cum = np.cumsum(np.concatenate(([last], vals)))[1:]
+                fp.write(pos.tobytes()); fc.write(cum.tobytes())
+                fp.flush(); fc.flush()
+                if cum.size: last = float(cum[-1])
+                meta = {"bound": hi-1, "count": meta["count"] + pos.size, "last": last}
+                _write_meta(d, meta)
+                if progress and i % max(1, len(tasks)//10) == 0:
+                    print(f"[psi_table] {hi-1}/{bound}  entradas={meta['count']}", flush=True)
+    finally:
+        if pool is not None:
+            pool.close(); pool.join()
+    return meta
+
+class PsiTable:
+    # psi[x] (entero o array) por busqueda binaria sobre el mapa de memoria
+    def __init__(self, d=DEFAULT_DIR):
+        meta = _read_meta(d)
+        self.bound = meta["bound"]; self.count = meta["count"]
+        n = self.count
+        self.pos = np.memmap(os.path.join(d, "pos.u64"), dtype=np.uint64, mode="r", shape=(n,)) if n else np.zeros(0, np.uint64)
+        self.cum = np.memmap(os.path.join(d, "cum.f64"), dtype=np.float64, mode="r", shape=(n,)) if n else np.zeros(0)
+
+    def __getitem__(self, x):
+        i = np.searchsorted(self.pos, np.asarray(x, dtype=np.uint64), side="right")
+        v = np.where(i > 0, self.cum[np.maximum(i-1, 0)], 0.0) if self.count else np.zeros(np.shape(x))
+        return float(v) if np.ndim(v) == 0 else v
+
+def open_table(d, xmax):
+    # PsiTable si existe y cubre xmax; si no, None
+    if d and os.path.exists(os.path.join(d, "meta.json")):
+        t = PsiTable(d)
+        if t.bound >= xmax:
+            return t
+    return None
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bound", type=float, required=True, help="cota superior (se admite 1e9)")
+    ap.add_argument("--dir", default=DEFAULT_DIR)
+    ap.add_argument("--segment", type=int, default=ps.SEGMENT)
+    ap.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2)//2))
+    ap.add_argument("--progress", action="store_true")
+    args = ap.parse_args()
+    meta = extend(args.dir, int(args.bound), args.segment, args.workers, args.progress)
+    print(json.dumps(meta))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+# zero_archive.py
+# Archivo comprimido sin perdida de ceros en alta precision, con acceso por bloques.
+# Cada gamma se guarda como entero exacto v = gamma*10^d (d = --digits decimales);
+# los ceros ordenados se cortan en bloques de B: el bloque lleva su base v_0 y las
+# diferencias v_j - v_{j-1} empaquetadas en w bits fijos (w = bits de la mayor).
+# Un indice final (N inicial, altura inicial, desplazamiento) da acceso aleatorio
+# por N o por altura decodificando un solo bloque.
+#
+#   python zero_archive.py --pack HR-StepA/zeros/odlyzko_zeros2.dat --out odl2.zarc
+#   python zero_archive.py --unpack odl2.zarc --format decimal --start 10 --count 5
+#   python zero_archive.py --unpack odl2.zarc --format dd --height 1000 --count 3
+#
+# Entrada: un cero por linea (coma decimal admitida) o, si hay lineas en blanco,
+# un cero por grupo de lineas (formato de odlyzko_zeros2.dat, ~1000 digitos por cero).
+# Por defecto d = maximo de decimales del texto, asi que no se pierde ningun digito;
+# con un d menor solo se admite si los digitos descartados son ceros (o --allow_round).
+# La tasa la limita la entropia de las diferencias: con espaciado medio s el bloque
+# gasta ~log2(s_max*10^d) bits por cero frente a ~8*(digitos+2) del texto, es decir
+# 2.4-4.6x en los ficheros del repo (10x no es alcanzable sin perder digitos);
+# --info imprime la tasa obtenida.
+
+import argparse, bisect, hashlib, itertools, json, os, struct
+from decimal import Decimal, getcontext
+try:
+    import numpy as np
+except ImportError:  # sin numpy: empaquetado con enteros de Python (mas lento)
+    np = None
+
+MAGIC = b"ZARCH001"
+HEADER_BYTES = 1024
+VERSION = 1
+BLOCK = 4096
+_BLK = struct.Struct("<IIH")   # ceros del bloque, bytes de la base, bits por diferencia
+
+def read_decimal_zeros(path):
+    # cadenas decimales de los ceros del texto, en el orden del fichero
+    with open(path, "r", encoding="utf-8-sig", errors="ignore") as f:
+        txt = f.read()
+    lines = [s.strip() for s in txt.splitlines()]
+    body = "\n".join(lines).strip("\n")
+    if "\n\n" in body:
+        items = ["".join(grp.split()) for grp in body.split("\n\n") if grp.strip()]
+    else:
+        items = [s for s in lines if s]
+    return [s.replace(",", ".") for s in items if not s.startswith("#")]
+
+def frac_digits(s):
+    return len(s.split(".", 1)[1]) if "." in s else 0
+
+def to_scaled(s, d, allow_round=False):
+    # (round(s*10^d), resto descartado en unidades de 10^-d como Decimal)
+    if s.startswith("-"):
+        raise ValueError(f"cero negativo: {s}")
+    ip, _, fp = s.lstrip("+").partition(".")
+    keep, drop = fp[:d].ljust(d, "0"), fp[d:]
+    v = int((ip or "0") + keep)
+    if drop.strip("0"):
+        if not allow_round:
+            raise ValueError(f"{s}: mas de {d} decimales (usa --digits mayor o --allow_round)")
+        r = Decimal("0." + drop)
+        if r > Decimal("0.5") or (r == Decimal("0.5") and v % 2):
+            v += 1; r -= 1
+        return v, r
+    return v, Decimal(0)
+
+NP_BITS = 64   # hasta aqui las diferencias caben en uint64 y se empaquetan con numpy
+
+def _pack(vals, w):
+    # vals[i] en los bits [i*w, (i+1)*w), little-endian. Con numpy y w <= 64 via
+    # packbits sobre la matriz de bits; si no, uniones por pares de enteros (O(n log n))
+    if not vals or w == 0:
+        return b""
+    if np is not None and w <= NP_BITS:
+        v = np.array(vals, dtype=np.uint64)
+        bits = ((v[:, None] >> np.arange(w, dtype=np.uint64)) & np.uint64(1)).astype(np.uint8)
+        return np.packbits(bits.ravel(), bitorder="little").tobytes()
+    parts, width = list(vals), w
+    while len(parts) > 1:
+        if len(parts) % 2: parts.append(0)
+        parts = [parts[i] | (parts[i+1] << width) for i in range(0, len(parts), 2)]
+        width *= 2
+    return parts[0].to_bytes((len(vals)*w + 7)//8, "little")
+
+def _unpack_bytes(raw, w, n):
+    # inversa de _pack: lista de n enteros de w bits
+    if n == 0: return []
+    if w == 0: return [0]*n
+    if np is not None and w <= NP_BITS:
+        bits = np.unpackbits(np.frombuffer(raw, dtype=np.uint8), count=n*w, bitorder="little")
+        sh = np.arange(w, dtype=np.uint64)
+        return (bits.reshape(n, w).astype(np.uint64) << sh).sum(axis=1, dtype=np.uint64).tolist()
+    return _unpack(int.from_bytes(raw, "little"), w, n)
+
+def _unpack(x, w, n):
+    # camino sin numpy (o w > 64) sobre el entero x: particion recursiva en mitades
+    if n == 0: return []
+    if w == 0: return [0]*n
+    if n == 1: return [x & ((1 << w) - 1)]
+    h = n//2
+    return _unpack(x & ((1 << (h*w)) - 1), w, h) + _unpack(x >> (h*w), w, n - h)
+
+def pack(src, dst, digits=None, block=BLOCK, allow_round=False):
+    # escribe el archivo y devuelve la cabecera
+    strs = read_decimal_zeros(src)
+    if not strs:
+        raise SystemExit(f"{src}: sin ceros")
+    dmax = max(frac_digits(s) for s in strs)
+    d = dmax if digits is None else digits
+    vals, worst = [], Decimal(0)
+    for s in strs:
+        ip, _, fp = s.partition(".")
+        if len(fp) <= d and ip.isdigit():   # caso comun: sin signo ni digitos de sobra
+            vals.append(int(ip + fp + "0"*(d - len(fp)))); continue
+        v, r = to_scaled(s, d, allow_round)
+        vals.append(v); worst = max(worst, abs(r))
+    in_order = all(a <= b for a, b in zip(vals, vals[1:]))
+    vals.sort()
+    h = hashlib.sha256()
+    with open(src, "rb") as f:
+        for b in iter(lambda: f.read(1 << 20), b""): h.update(b)
+    idx_n, idx_h, idx_off = [], [], []
+    tmp = dst + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(b"\0"*HEADER_BYTES)
+        for n0 in range(0, len(vals), block):
+            blk = vals[n0:n0+block]
+            base = blk[0]
+            deltas = [b - a for a, b in zip(blk, blk[1:])]
+            w = max(deltas, default=0).bit_length()
+            bb = base.to_bytes(max(1, (base.bit_length() + 7)//8), "little")
+            idx_n.append(n0); idx_h.append(base/10**d); idx_off.append(f.tell())
+            f.write(_BLK.pack(len(blk), len(bb), w)); f.write(bb); f.write(_pack(deltas, w))
+        index_offset = f.tell()
+        f.write(struct.pack(f"<{len(idx_n)}Q", *idx_n))
+        f.write(struct.pack(f"<{len(idx_h)}d", *idx_h))
+        f.write(struct.pack(f"<{len(idx_off)}Q", *idx_off))
+        size = f.tell()
+        hdr = {"version": VERSION, "count": len(vals), "digits": d, "text_digits": dmax, "block": block,
+               "nblocks": len(idx_n), "index_offset": index_offset, "sorted_in_source": in_order,
+               "max_rounding": str(worst*Decimal(10)**-d) if worst else "0",
+               "source": os.path.basename(src), "source_size": os.path.getsize(src),
+               "source_sha256": h.hexdigest(), "archive_size": size}
+        hb = MAGIC + json.dumps(hdr).encode("utf-8")
+        if len(hb) > HEADER_BYTES:
+            raise SystemExit("zero_archive: cabecera demasiado grande")
+        f.seek(0); f.write(hb.ljust(HEADER_BYTES, b" "))
+    os.replace(tmp, dst)
+    return hdr
+
+class ZeroArchive:
+    # Lectura por bloques; los valores exactos son enteros v con gamma = v/10^digits
+    def __init__(self, path):
+        self.f = open(path, "rb")
+        head = self.f.read(HEADER_BYTES)
+        if not head.startswith(MAGIC):
+            raise ValueError(f"{path}: no es un zero_archive")
+        self.header = json.loads(head[len(MAGIC):].decode("utf-8").rstrip())
+        if self.header["version"] != VERSION:
+            raise ValueError(f"{path}: version {self.header['version']} != {VERSION}")
+        self.count, self.digits, nb = self.header["count"], self.header["digits"], self.header["nblocks"]
+        self.f.seek(self.header["index_offset"])
+        self.idx_n = list(struct.unpack(f"<{nb}Q", self.f.read(8*nb)))
+        self.idx_h = list(struct.unpack(f"<{nb}d", self.f.read(8*nb)))
+        self.idx_off = list(struct.unpack(f"<{nb}Q", self.f.read(8*nb)))
+        self.scale = 10**self.digits
+
+    def close(self):
+        self.f.close()
+
+    def block_ints(self, b):
+        self.f.seek(self.idx_off[b])
+        n, lb, w = _BLK.unpack(self.f.read(_BLK.size))
+        base = int.from_bytes(self.f.read(lb), "little")
+        raw = self.f.read(((n - 1)*w + 7)//8)
+        return list(itertools.accumulate(_unpack_bytes(raw, w, n - 1), initial=base))
+
+    def iter_ints(self, start=0, stop=None):
+        # v_j para start <= j < stop, bloque a bloque
+        stop = self.count if stop is None else min(stop, self.count)
+        if start >= stop: return
+        b = bisect.bisect_right(self.idx_n, start) - 1
+        j = self.idx_n[b]
+        while j < stop:
+            for v in self.block_ints(b):
+                if j >= stop: return
+                if j >= start: yield v
+                j += 1
+            b += 1
+
+    def count_le(self, T):
+        # #{gamma <= T} comparando los float64, como cutoff_index sobre read_gammas;
+        # la altura inicial de cada bloque dice que bloque decodificar
+        b = bisect.bisect_right(self.idx_h, T) - 1
+        if b < 0: return 0
+        return self.idx_n[b] + bisect.bisect_right([self.to_float(v) for v in self.block_ints(b)], T)
+
+    def to_float(self, v):
+        return v/self.scale          # division entera correctamente redondeada
+
+    def to_dd(self, v):
+        hi = v/self.scale
+        p, q = hi.as_integer_ratio()
+        return hi, (v*q - p*self.scale)/(self.scale*q)
+
+    def to_decimal(self, v):
+        return Decimal(v).scaleb(-self.digits)
+
+    def gammas(self, start=0, stop=None, kind="float"):
+        conv = {"float": self.to_float, "dd": self.to_dd, "decimal": self.to_decimal}[kind]
+        for v in self.iter_ints(start, stop):
+            yield conv(v)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pack", default=None, help="texto de ceros a archivar")
+    ap.add_argument("--unpack", default=None, help="archivo .zarc a leer")
+    ap.add_argument("--info", default=None, help="cabecera y tasa de un .zarc")
+    ap.add_argument("--out", default=None, help="destino (--pack: por defecto <src>.zarc; --unpack: stdout)")
+    ap.add_argument("--digits", type=int, default=None, help="decimales guardados (por defecto los del texto)")
+    ap.add_argument("--allow_round", action="store_true", help="admite --digits menor que el texto redondeando")
+    ap.add_argument("--block", type=int, default=BLOCK, help="ceros por bloque")
+    ap.add_argument("--format", choices=["float", "dd", "decimal"], default="decimal")
+    ap.add_argument("--start", type=int, default=0, help="primer indice N (desde 0)")
+    ap.add_argument("--height", type=float, default=None, help="empieza en el primer cero > altura")
+    ap.add_argument("--count", type=int, default=None, help="ceros a decodificar")
+    ap.add_argument("--verify", action="store_true", help="--pack: relee todo y compara con el texto")
+    args = ap.parse_args()
+    if args.pack:
+        dst = args.out or args.pack + ".zarc"
+        h = pack(args.pack, dst, args.digits, args.block, args.allow_round)
+        print(f"[zero_archive] {h['count']} ceros, {h['digits']} decimales: {h['source_size']} -> {h['archive_size']} B "
+              f"({h['source_size']/h['archive_size']:.2f}x)" + ("" if h["max_rounding"] == "0" else f", redondeo max {h['max_rounding']}"))
+        if args.verify:
+            getcontext().prec = h["digits"] + 40
+            z = ZeroArchive(dst)
+            ref = sorted(Decimal(s) for s in read_decimal_zeros(args.pack))
+            got = list(z.gammas(kind="decimal"))
+            bad = sum(1 for a, b in zip(ref, got) if abs(a - b) > Decimal(h["max_rounding"]))
+            print(f"[verify] {len(got)} ceros, {bad} distintos del texto")
+            z.close()
+            if bad or len(got) != len(ref): raise SystemExit(1)
+        print(dst)
+        return
+    if args.info:
+        z = ZeroArchive(args.info)
+        h = dict(z.header); h["ratio"] = round(h["source_size"]/h["archive_size"], 3)
+        h["bytes_per_zero"] = round(h["archive_size"]/max(1, h["count"]), 3)
+        print(json.dumps(h, indent=2))
+        return
+    if not args.unpack:
+        ap.error("usa --pack, --unpack o --info")
+    z = ZeroArchive(args.unpack)
+    start = z.count_le(args.height) if args.height is not None else args.start
+    stop = None if args.count is None else start + args.count
+    out = open(args.out, "w", encoding="utf-8") if args.out else None
+    try:
+        for g in z.gammas(start, stop, args.format):
+            s = f"{g[0]!r} {g[1]!r}" if args.format == "dd" else (repr(g) if args.format == "float" else str(g))
+            if out: out.write(s + "\n")
+            else: print(s)
+    finally:
+        if out: out.close()
+        z.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+# zero_store.py
+# Almacen binario de ceros junto al fichero de texto (<fichero>.bin), mapeado en
+# memoria de solo lectura, para no reparsear el texto en cada herramienta.
+#
+#   python zero_store.py canonical_idxgamma_T10000.txt            # crea canonical_idxgamma_T10000.txt.bin
+#   python zero_store.py canonical_idxgamma_T10000.txt --info     # cabecera y estado frente al texto
+#   python zero_store.py canonical_idxgamma_T10000.txt --lookup 1000 5000
+#
+# Formato: 4096 B de cabecera (MAGIC + JSON con relleno) y secciones alineadas a 8 B:
+#   g       float64[N]  gammas ordenados (los mismos floats que read_gammas)
+#   lo      float64[N]  opcional: g + lo = valor decimal del texto (doble-doble, engine dd)
+#   a, b    float64[N]  opcionales: 1/(1/4+g^2)*1/2 y g/(1/4+g^2)
+#   bucket  int64[M+1]  bucket[i] = #{g < g0 + i*w}: altura -> indice en O(1)
+# La cabecera guarda tamano, mtime y sha256 del texto de origen: si no coinciden
+# (y el sha256 tampoco) el .bin se ignora y los cargadores vuelven al texto.
+# 'plain' indica que cada linea es un unico float con punto decimal en [10, 1e14]:
+# solo entonces todos los cargadores (read_gammas, close_stepA.load_gammas,
+# li_verify_full.load_gammas) leerian del texto los mismos valores que hay en g;
+# 'sorted' que el texto ya venia en orden (li_verify_full conserva el del fichero).
+# read_sorted devuelve la vista mapeada de g y deja el almacen abierto: zero_coeffs
+# de explicit_engine toma entonces a y b del .bin en vez de recalcularlos.
+# count_le resuelve alturas sueltas (CLI, recorte por Tcap de close_stepA); los
+# motores cortan muchos T a la vez con cutoff_index (searchsorted vectorizado).
+# Si zeros_base.hash.txt existe y no lista el sha256 del texto, open_sidecar avisa.
+
+import argparse, hashlib, json, math, mmap, os, re, sys
+try:
+    import numpy as np
+except ImportError:  # explicit_compare_npyfree.py: sin numpy se lee siempre el texto
+    np = None
+
+MAGIC = b"ZSTORE01"
+HEADER_BYTES = 4096
+VERSION = 1
+HASH_FILE = "zeros_base.hash.txt"
+_OPEN = []       # almacenes devueltos por read_sorted (sus g siguen mapeados)
+_WARNED = set()
+_PLAIN = re.compile(r"[+-]?\d+(?:\.\d*)?(?:[eE][+-]?\d+)?$")
+
+def sidecar_path(src):
+    return str(src) + ".bin"
+
+def file_sha256(path, chunk=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for blk in iter(lambda: f.read(chunk), b""):
+            h.update(blk)
+    return h.hexdigest()
+
+def base_hashes(src, hash_file=None):
+    # sha256 listados en zeros_base.hash.txt (salida de Get-FileHash, UTF-16) junto al
+    # texto o en HR-StepA/zeros; conjunto vacio si no hay fichero
+    cands = [hash_file] if hash_file else [os.path.join(os.path.dirname(os.path.abspath(src)), HASH_FILE),
+                                           os.path.join(os.path.dirname(os.path.abspath(__file__)), "HR-StepA", "zeros", HASH_FILE)]
+    for p in cands:
+        if p and os.path.exists(p):
+            raw = open(p, "rb").read()
+            txt = raw.decode("utf-16") if raw[:2] in (b"\xff\xfe", b"\xfe\xff") else raw.decode("utf-8", "ignore")
+            return {m.lower() for m in re.findall(r"\b[0-9A-Fa-f]{64}\b", txt)}
+    return set()
+
+def _parse_text(src):
+    # (strings, plain) de las lineas no vacias; coma decimal admitida
+    out, plain = [], True
+    with open(src, "r", encoding="utf-8-sig", errors="ignore") as f:
+        for s in f:
+            s = s.strip()
+            if not s: continue
+            if not _PLAIN.match(s):
+                plain = False
+            out.append(s.replace(",", "."))
+    return out, plain
+
+def build(src, dst=None, lo=True, coeffs=True, hash_file=None):
+    # Escribe el .bin de src y devuelve la cabecera
+    from explicit_engine import dd_split
+    dst = dst or sidecar_path(src)
+    strings, plain = _parse_text(src)
+    hi, lw = dd_split(strings)
+    in_order = bool(np.all(hi[1:] >= hi[:-1])) if hi.size else True
+    o = np.argsort(hi, kind="stable")
+    g = hi[o]; lw = lw[o]
+    if g.size and not (10.0 <= g[0] and g[-1] <= 1.0e14):
+        plain = False
+    n = g.size
+    # cubetas de ancho ~ espaciado medio: ~1 cero por cubeta
+    g0 = math.floor(float(g[0])) if n else 0.0
+    span = (float(g[-1]) - g0) if n else 0.0
+    nb = max(1, n)
+    w = span/nb if span > 0 else 1.0
+    edges = g0 + w*np.arange(nb + 1)
+    bucket = np.searchsorted(g, edges, side="left").astype(np.int64)
+    bucket[-1] = n   # la ultima cubeta llega hasta gmax inclusive
+    st = os.stat(src)
+    sha = file_sha256(src)
+    sections = [("g", g)]
+    if lo: sections.append(("lo", lw))
+    if coeffs:
+        den = 0.25 + g*g
+        sections += [("a", 0.5/den), ("b", g/den)]
+    sections.append(("bucket", bucket))
+    off = HEADER_BYTES; layout = {}
+    for name, arr in sections:
+        layout[name] = [off, str(arr.dtype), int(arr.size)]
+        off += arr.nbytes
+    bases = base_hashes(src, hash_file)
+    hdr = {"version": VERSION, "count": int(n), "gmin": float(g[0]) if n else None, "gmax": float(g[-1]) if n else None,
+           "bucket_origin": g0, "bucket_width": w, "nbuckets": nb, "sections": layout, "plain": plain, "sorted": in_order,
+           "source": os.path.basename(src), "source_size": st.st_size, "source_mtime_ns": st.st_mtime_ns,
+           "source_sha256": sha, "base_hash_listed": (sha in bases) if bases else None}
+    hb = MAGIC + json.dumps(hdr).encode("utf-8")
+    if len(hb) > HEADER_BYTES:
+        raise SystemExit("zero_store: cabecera demasiado grande")
+    tmp = dst + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(hb.ljust(HEADER_BYTES, b" "))
+        for _, arr in sections:
+            f.write(np.ascontiguousarray(arr).astype(arr.dtype.newbyteorder("<")).tobytes())
+    os.replace(tmp, dst)
+    return hdr
+
+class ZeroStore:
+    # Vista de solo lectura de un .bin: g, lo, a, b (None si no estan) y bucket
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            head = f.read(HEADER_BYTES)
+            if not head.startswith(MAGIC):
+                raise ValueError(f"{path}: no es un zero_store")
+            self.header = json.loads(head[len(MAGIC):].decode("utf-8").rstrip())
+            if self.header.get("version") != VERSION:
+                raise ValueError(f"{path}: version {self.header.get('version')} != {VERSION}")
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        for name in ("g", "lo", "a", "b", "bucket"):
+            sec = self.header["sections"].get(name)
+            arr = None
+            if sec:
+                off, dt, n = sec
+                arr = np.frombuffer(self._mm, dtype=np.dtype(dt).newbyteorder("<"), count=n, offset=off)
+            setattr(self, name, arr)
+        self.g0 = self.header["bucket_origin"]; self.w = self.header["bucket_width"]
+        self.nb = self.header["nbuckets"]
+
+    def __len__(self):
+        return self.header["count"]
+
+    def count_le(self, T):
+        # #{g <= T} (= cutoff_index) con la tabla de cubetas y una busqueda local
+        i = int((T - self.g0)//self.w) if T >= self.g0 else -1
+        if i < 0: return 0
+        if i >= self.nb: return len(self)
+        # una cubeta de margen a cada lado: el redondeo de g0 + i*w no afecta
+        j0, j1 = int(self.bucket[max(i - 1, 0)]), int(self.bucket[min(i + 2, self.nb)])
+        return j0 + int(np.searchsorted(self.g[j0:j1], T, side="right"))
+
+    def fresh(self, src):
+        # el .bin corresponde al texto actual de src
+        h = self.header
+        try:
+            st = os.stat(src)
+        except OSError:
+            return False
+        if st.st_size != h["source_size"]: return False
+        if st.st_mtime_ns == h["source_mtime_ns"]: return True
+        return file_sha256(src) == h["source_sha256"]
+
+def open_sidecar(src, need_plain=True, need=()):
+    # ZeroStore del .bin de src si existe, esta al dia y tiene las secciones pedidas; si no, None
+    p = sidecar_path(src)
+    if np is None or not os.path.exists(p):
+        return None
+    try:
+        zs = ZeroStore(p)
+    except (ValueError, OSError) as e:
+        print(f"[zero_store] {p} ignorado: {e}", file=sys.stderr)
+        return None
+    if not zs.fresh(src):
+        print(f"[zero_store] {p} no corresponde a {src}: se lee el texto (regenera con zero_store.py)", file=sys.stderr)
+        return None
+    if need_plain and not zs.header["plain"]:
+        return None
+    if any(getattr(zs, s) is None for s in need):
+        return None
+    if zs.header.get("base_hash_listed") is False and p not in _WARNED:
+        _WARNED.add(p)
+        print(f"[zero_store] AVISO: el sha256 de {src} no esta en {HASH_FILE}: ceros no verificados "
+              f"({zs.header['source_sha256'][:12]}...)", file=sys.stderr)
+    return zs
+
+def read_sorted(src, as_list=False):
+    # gammas ordenados como read_gammas, o None si no hay .bin utilizable: vista
+    # float64 mapeada (sin copia) o, con as_list, list de floats (camino sin numpy)
+    zs = open_sidecar(src)
+    if zs is None:
+        return None
+    if as_list:
+        return zs.g.tolist()
+    _OPEN.append(zs)
+    return zs.g
+
+def coeffs_for(g):
+    # (g, a, b) del .bin si g es la vista devuelta por read_sorted y tiene a, b
+    for zs in _OPEN:
+        if g is zs.g and zs.a is not None:
+            return zs.g, zs.a, zs.b
+    return None
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("src", help="fichero de texto de ceros (una gamma por linea)")
+    ap.add_argument("--out", default=None, help="destino (por defecto <src>.bin)")
+    ap.add_argument("--no_lo", action="store_true", help="sin parte baja doble-doble")
+    ap.add_argument("--no_coeffs", action="store_true", help="sin coeficientes a, b")
+    ap.add_argument("--hash_file", default=None, help=f"lista de sha256 de referencia (por defecto {HASH_FILE})")
+    ap.add_argument("--info", action="store_true", help="muestra la cabecera del .bin existente")
+    ap.add_argument("--lookup", type=float, nargs="+", default=None, help="alturas T: imprime #{g <= T}")
+    args = ap.parse_args()
+    dst = args.out or sidecar_path(args.src)
+    if args.info or args.lookup:
+        zs = ZeroStore(dst)
+        if args.info:
+            h = dict(zs.header); h["fresh"] = zs.fresh(args.src)
+            print(json.dumps(h, indent=2))
+        for T in args.lookup or []:
+            print(f"{T:g}\t{zs.count_le(T)}")
+        return
+    h = build(args.src, dst, not args.no_lo, not args.no_coeffs, args.hash_file)
+    listed = {True: "en", False: "NO esta en", None: "sin"}[h["base_hash_listed"]]
+    print(f"[zero_store] {h['count']} ceros -> {dst} (plain={h['plain']}, sha256 {h['source_sha256'][:12]}... {listed} {HASH_FILE})")
+
+if __name__ == "__main__":
+    main()